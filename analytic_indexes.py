@@ -0,0 +1,64 @@
+"""
+Typed date columns and covering indexes for the analytic queries.
+
+Petitions.year and Petitions.month are transcribed text ('1843', 'April'), so range
+filters had to CAST every row and could not use an index. index_petitions() adds
+year_int and month_int, fills them from the text columns, and creates the indexes
+the Shiny map, the Flask routes and queries/ join and filter on. Every build calls it
+after loading (building indexes after a bulk insert is cheaper than maintaining them
+row by row), and migration 0005 applies it to older databases. It can be run again
+safely; only rows without a parsed date yet are updated.
+"""
+
+import build_stats
+
+# (index name, table, columns)
+ANALYTIC_INDEXES = [
+    ('idx_prl_petition_reasoning', 'Petition_Reasoning_Lookup', 'petition_id, reasoning_id'),
+    ('idx_prl_reasoning_petition', 'Petition_Reasoning_Lookup', 'reasoning_id, petition_id'),
+    ('idx_ppl_petition_person', 'Petition_People_Lookup', 'petition_id, person_id'),
+    # Person -> petitions, used by the Petition_Search triggers when a person is renamed or deleted
+    ('idx_ppl_person_petition', 'Petition_People_Lookup', 'person_id, petition_id'),
+    ('idx_petitions_petitioner', 'Petitions', 'petitioner_id'),
+    ('idx_petitions_defendant', 'Petitions', 'defendant_id'),
+    ('idx_result_petition_result', 'Result', 'petition_id, result'),
+    ('idx_petitions_state_year', 'Petitions', 'state, year_int'),
+    ('idx_petitions_county_state', 'Petitions', 'county, state'),
+]
+
+MONTHS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+
+# First four digits of the year text ('1843', '1843?', '1843-44'); NULL when there are none
+YEAR_SQL = "CASE WHEN trim(year) GLOB '[0-9][0-9][0-9][0-9]*' THEN CAST(substr(trim(year), 1, 4) AS INTEGER) END"
+
+# Month names and abbreviations ('April', 'Sept.') or numbers 1-12
+MONTH_SQL = ('CASE WHEN trim(month) GLOB \'[0-9]*\' AND CAST(trim(month) AS INTEGER) BETWEEN 1 AND 12 '
+             'THEN CAST(trim(month) AS INTEGER) ELSE CASE lower(substr(trim(month), 1, 3)) '
+             + ' '.join(f"WHEN '{name}' THEN {number}" for number, name in enumerate(MONTHS, 1))
+             + ' END END')
+
+
+def add_date_columns(conn):
+    """Add and fill Petitions.year_int and month_int; the caller commits.
+    Returns the number of rows updated."""
+    columns = [col[1] for col in conn.execute('PRAGMA table_info(Petitions)')]
+    for column in ('year_int', 'month_int'):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE Petitions ADD COLUMN {column} INTEGER')
+    cursor = conn.execute(f'''
+        UPDATE Petitions SET year_int = {YEAR_SQL}, month_int = {MONTH_SQL}
+        WHERE year_int IS NULL AND month_int IS NULL
+    ''')
+    return cursor.rowcount
+
+
+def create_analytic_indexes(conn):
+    for name, table, columns in ANALYTIC_INDEXES:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+
+
+def index_petitions(conn):
+    """Typed date columns plus the analytic indexes; the caller commits"""
+    with build_stats.stage('index') as stage:
+        stage['rows'] = add_date_columns(conn)
+        create_analytic_indexes(conn)
@@ -0,0 +1,114 @@
+"""
+Per-stage instrumentation for the database build.
+
+Each stage (CSV parsing, people resolution, migrations, geocoding, ...) is wrapped in
+stage(), which appends one JSON line to build_db.log with its wall time, rows
+processed and statements_traced. That is the number of statements SQLite reported
+starting on connections passed to watch(): every row of an executemany counts, and so
+does each run of a trigger, but FTS5's internal statements do not. It measures how much
+SQL a stage drives, not how many execute calls it makes. With memory tracing on, the
+record also holds the stage's tracemalloc peak; tracemalloc slows allocation-heavy
+stages noticeably, so it is off by default. With a profile directory configured, every
+top-level stage is also run under cProfile and dumped to <dir>/<stage>.prof.
+
+Nothing is recorded until configure() is called, so the builders can be imported
+and used (e.g. by scripts/benchmark_etl.py) without touching build_db.log.
+"""
+
+import cProfile
+import datetime
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+LOG_PATH = 'build_db.log'
+
+_config = {'log_path': None, 'profile_dir': None, 'trace_memory': False}
+_active = []  # stack of open stage records, innermost last
+
+
+def configure(log_path=LOG_PATH, profile_dir=None, trace_memory=False):
+    """Start recording stages to log_path, optionally with a cProfile dump per top-level
+    stage and the tracemalloc peak of every stage"""
+    _config['log_path'] = log_path
+    _config['profile_dir'] = profile_dir
+    _config['trace_memory'] = trace_memory
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+
+
+def enabled():
+    return _config['log_path'] is not None
+
+
+def _count_statement(sql):
+    # Statements SQLite runs on its own behalf (FTS5 shadow tables, ...) are traced as '-- ...'
+    if sql.startswith('--'):
+        return
+    for record in _active:
+        record['statements_traced'] += 1
+
+
+def watch(conn):
+    """Count the statements run on conn towards every open stage; returns conn"""
+    if enabled():
+        conn.set_trace_callback(_count_statement)
+    return conn
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block and log it as one stage.
+
+    Yields the stage record; set record['rows'] to the number of rows it processed.
+    Stages nest: an inner stage's statements and memory peak also count towards the
+    enclosing one.
+    """
+    record = {'stage': name, 'parent': _active[-1]['stage'] if _active else None,
+              'rows': None, 'statements_traced': 0}
+    if not enabled():
+        yield record
+        return
+
+    trace_memory = _config['trace_memory']
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if trace_memory:
+        # Fold the running peak into the enclosing stage before resetting it for this one
+        if _active:
+            _active[-1]['_peak'] = max(_active[-1]['_peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        record['_peak'] = 0
+
+    profiler = None
+    if _config['profile_dir'] and not _active:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    _active.append(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - start
+        _active.pop()
+        if trace_memory:
+            peak = max(record.pop('_peak'), tracemalloc.get_traced_memory()[1])
+            if _active:
+                _active[-1]['_peak'] = max(_active[-1]['_peak'], peak)
+        if started_tracing:
+            tracemalloc.stop()
+        if profiler is not None:
+            profiler.disable()
+            record['profile'] = os.path.join(_config['profile_dir'], f'{name}.prof')
+            profiler.dump_stats(record['profile'])
+
+        record['seconds'] = round(seconds, 4)
+        if trace_memory:
+            record['tracemalloc_peak_mb'] = round(peak / (1024 * 1024), 2)
+        record['logged_at'] = datetime.datetime.now().isoformat(timespec='seconds')
+        with open(_config['log_path'], 'a', encoding='utf-8') as log:
+            log.write(json.dumps(record) + '\n')
@@ -1,479 +1,983 @@
-import csv
 import sqlite3
 import os
 from collections import defaultdict
 import argparse
-import shutil
-import datetime
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import build_stats
+import migrations
+import snapshots
+from analytic_indexes import index_petitions
+from etl_shards import court_key, iter_rows, merge_shards, parse_shard, row_hash, split_list
+from petition_cube import build_cube, ensure_cube
+from petition_search import build_search, create_request_links, ensure_search
+from reasoning_bitmap import build_bitmaps
+from people_migration import split_people
+from reasoning_normalizer import load_reasoning_ids, split_terms
 
 CSV_PATH = '/Users/eahorton/Downloads/nc_al_tn_clean_data.csv'
 DB_PATH = 'dv_petitions.db'
-
-# Define terminology replacements for reasoning terms
-REASONING_REPLACEMENTS = {
-    'prostitution(F)': 'sex_work(F)',
-    'adultery_with_prostitute(M)': 'adultery_with_sex_worker(M)',
-    'possible_prostitution(F)': 'possible_sex_work(F)',
-    'allowed_prostitution_in_his_home(M)': 'allowed_sex_work_in_home(M)',
-    'sex_with_prostitutes(M)': 'sex_with_sex_workers(M)',
-    'adultery_with_prostitutes(M)': 'adultery_with_sex_workers(M)',
-    'birth_mulatto_children(F)': 'birth_mixed_race_children(F)',
-    'birth_mulatto_child(F)': 'birth_mixed_race_child(F)',
-    'father_mulatto_child(M)': 'father_mixed_race_child(M)',
-    'father_mulatto_children(M)': 'father_mixed_race_children(M)',
-    'homosexual(M)': 'same_sex_attraction(M)'
-}
-
-# Read CSV and clean whitespace from headers and cells
-rows = []
-with open(CSV_PATH, newline='', encoding='utf-8') as csvfile:
-    reader = csv.DictReader(csvfile)
-    # Clean header names
-    reader.fieldnames = [h.strip() for h in reader.fieldnames]
-    for row in reader:
-        clean_row = {k.strip(): v.strip() for k, v in row.items()}
-        rows.append(clean_row)
-
-# --- Reasoning Table ---
-reasoning_set = set()
-reasoning = []
-reasoning_id_map = {}
-reasoning_id_counter = 1
-for row in rows:
-    terms = [t.strip() for t in row['reasoning'].split(',') if t.strip()]
-    for term in terms:
-        # Apply terminology replacement
-        term = REASONING_REPLACEMENTS.get(term, term)
-        if term and term not in reasoning_set:
-            reasoning_set.add(term)
-            party_accused = None
-            clean_term = term
-            
-            # Handle (M) and (F) suffixes
-            if term.endswith('(M)'):
-                party_accused = 'husband_accused'
-                clean_term = term[:-3]
-            elif term.endswith('(F)'):
-                party_accused = 'wife_accused'
-                clean_term = term[:-3]
-            
-            reasoning_id_map[term] = reasoning_id_counter
-            reasoning.append((reasoning_id_counter, clean_term, party_accused))
-            reasoning_id_counter += 1
-
-# --- Petition_Reasoning_Lookup Table ---
-petition_reasoning_lookup = []
-for idx, row in enumerate(rows, 1):
-    terms = [t.strip() for t in row['reasoning'].split(',') if t.strip()]
-    for term in terms:
-        # Apply terminology replacement to ensure lookup matches
-        term = REASONING_REPLACEMENTS.get(term, term)
-        reasoning_id = reasoning_id_map.get(term)
-        if reasoning_id:
-            petition_reasoning_lookup.append((idx, reasoning_id))
-
-# --- Initialize data structures for People and Petitions ---
-people_set = set()
-people = []
-person_id_map = {}
-person_id_counter = 1
-petition_id_map = {}
-
-# First create petition_id_map since it's needed for lookups
-for idx, row in enumerate(rows, 1):
-    petition_id_map[row['parcel_number']] = idx
-
-# Now process people
-for row in rows:
-    enslaver_status = row.get('enslaver_status', '')
-    enslaver_scope = row.get('enslaver_scope_estimate', '')
-    for role in ['petitioner', 'defendant']:
-        name = row[role]
-        key = (name, enslaver_status, enslaver_scope)
-        if name and key not in people_set:
-            people_set.add(key)
-            person_id_map[key] = person_id_counter
-            people.append((person_id_counter, name, enslaver_status, enslaver_scope))
-            person_id_counter += 1
-
-# --- Petition_People_Lookup Table ---
-lookup = []
-for row in rows:
-    parcel = row['parcel_number']
-    pid = petition_id_map[parcel]
-    enslaver_status = row.get('enslaver_status', '')
-    enslaver_scope = row.get('enslaver_scope_estimate', '')
-    for role in ['petitioner', 'defendant']:
-        name = row[role]
-        key = (name, enslaver_status, enslaver_scope)
-        if name:
-            lookup.append((pid, person_id_map[key]))
-
-# --- Archive Lookup Table ---
-archive_set = set()
-archive = []
-archive_id_map = {}
-archive_id_counter = 1
-for row in rows:
-    arch = row['archive'].strip()
-    if arch and arch not in archive_set:
-        archive_set.add(arch)
-        archive_id_map[arch] = archive_id_counter
-        archive.append((archive_id_counter, arch))
-        archive_id_counter += 1
-
-# --- Additional Requests Table ---
-addreq_set = set()
-addreq = []
-addreq_id_map = {}
-addreq_id_counter = 1
-for row in rows:
-    req = row['additional_requests'].strip()
-    if req and req not in addreq_set:
-        addreq_set.add(req)
-        addreq_id_map[req] = addreq_id_counter
-        addreq.append((addreq_id_counter, req))
-        addreq_id_counter += 1
-
-# --- Create SQLite DB ---
-if os.path.exists(DB_PATH):
-    os.remove(DB_PATH)
-conn = sqlite3.connect(DB_PATH)
-c = conn.cursor()
-# Enforce foreign key constraints
-c.execute('PRAGMA foreign_keys = ON')
-
-c.execute('''CREATE TABLE Petitions (
-    petition_id INTEGER PRIMARY KEY,
-    parcel_number TEXT,
-    archive TEXT,
-    month TEXT,
-    year TEXT,
-    county TEXT,
-    state TEXT,
-    years_married TEXT,
-    court TEXT,
-    additional_requests_id INTEGER,
-    petitioner_id INTEGER,
-    defendant_id INTEGER,
-    FOREIGN KEY(additional_requests_id) REFERENCES Additional_Requests(additional_requests_id),
-    FOREIGN KEY(petitioner_id) REFERENCES People(person_id),
-    FOREIGN KEY(defendant_id) REFERENCES People(person_id)
-)''')
-c.execute('''CREATE TABLE Petition_Reasoning_Lookup (
-    petition_id INTEGER,
-    reasoning_id INTEGER
-)''')
-c.execute('''CREATE TABLE People (
-    person_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT,
-    enslaver_status TEXT,
-    enslaver_scope_estimate TEXT,
-    UNIQUE(name, enslaver_status, enslaver_scope_estimate)
-)''')
-c.execute('''CREATE TABLE Petition_People_Lookup (
-    petition_id INTEGER,
-    person_id INTEGER
-)''')
-c.execute('''CREATE TABLE Reasoning (
-    reasoning_id INTEGER PRIMARY KEY,
-    reasoning TEXT,
-    party_accused TEXT
-)''')
-c.execute('''CREATE TABLE Archive_Lookup (
-    archive_id INTEGER PRIMARY KEY,
-    archive TEXT
-)''')
-c.execute('''CREATE TABLE Additional_Requests (
-    additional_requests_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    additional_requests TEXT UNIQUE
-)''')
-c.execute('''CREATE TABLE Geolocations (
-    geolocation_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    county TEXT,
-    state TEXT,
-    latitude REAL,
-    longitude REAL,
-    UNIQUE(county, state)
-)''')
-
-# Insert Reasoning, Archive lookup rows
-c.executemany('INSERT INTO Reasoning VALUES (?, ?, ?)', reasoning)
-c.executemany('INSERT INTO Archive_Lookup VALUES (?, ?)', archive)
-
-# Insert people using INSERT OR IGNORE and build a mapping from (name,status,scope) -> person_id
-person_key_to_id = {}
-for _pid, name, status, scope in people:
-    key = (name, status, scope)
-    c.execute('INSERT OR IGNORE INTO People (name, enslaver_status, enslaver_scope_estimate) VALUES (?, ?, ?)', (name, status, scope))
-    c.execute('SELECT person_id FROM People WHERE name=? AND enslaver_status=? AND enslaver_scope_estimate=?', (name, status, scope))
-    person_key_to_id[key] = c.fetchone()[0]
-
-# Rebuild Petition_People_Lookup using mapped person_ids (we'll insert after Petitions are created)
-new_lookup = []
-for row in rows:
-    parcel = row['parcel_number']
-    pid = petition_id_map[parcel]
-    enslaver_status = row.get('enslaver_status', '')
-    enslaver_scope = row.get('enslaver_scope_estimate', '')
-    for role in ['petitioner', 'defendant']:
-        name = row[role]
-        key = (name, enslaver_status, enslaver_scope)
-        new_person_id = person_key_to_id.get(key)
-        if new_person_id:
-            new_lookup.append((pid, new_person_id))
-
-
-# --- Split Additional Requests into separate rows ---
-split_addreq = []
-for addreq_id, req in addreq:
-    if req:
-        requests = [r.strip() for r in req.split(',') if r.strip()]
-        for r in requests:
-            split_addreq.append((addreq_id, r))
-
-# Overwrite the Additional_Requests table with split entries
-c.execute('DROP TABLE IF EXISTS Additional_Requests')
-c.execute('''CREATE TABLE Additional_Requests (
-    additional_requests_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    additional_requests TEXT UNIQUE
-)''')
-# Insert only the split request text; allow the DB to assign unique IDs
-texts = [(r,) for (_aid, r) in split_addreq]
-c.executemany('INSERT OR IGNORE INTO Additional_Requests (additional_requests) VALUES (?)', texts)
-
-# Build a map from the inserted additional_requests text -> their new autoincremented id
-addreq_text_to_id = {}
-for aid, text in c.execute('SELECT additional_requests_id, additional_requests FROM Additional_Requests'):
-    if text:
-        addreq_text_to_id[text.lower()] = aid
-
-
-# Create Petitions entries with person IDs and additional_requests_id
-petitions = []
-petition_id_map = {}
-for idx, row in enumerate(rows, 1):
-    petition_id_map[row['parcel_number']] = idx
+# Rows per executemany batch in the streaming ETL
+BATCH_SIZE = 5000
+
+
+def read_rows(csv_path=CSV_PATH):
+    """Read the whole CSV into a list of cleaned rows"""
+    with build_stats.stage('read_csv') as stage:
+        rows = list(iter_rows(csv_path))
+        stage['rows'] = len(rows)
+    return rows
+
+
+def create_schema(c):
+    """Create the normalized tables in an empty database"""
+    c.execute('''CREATE TABLE Petitions (
+        petition_id INTEGER PRIMARY KEY,
+        parcel_number TEXT,
+        archive TEXT,
+        month TEXT,
+        year TEXT,
+        county TEXT,
+        state TEXT,
+        years_married TEXT,
+        court TEXT,
+        additional_requests_id INTEGER,
+        petitioner_id INTEGER,
+        defendant_id INTEGER,
+        court_id INTEGER,
+        FOREIGN KEY(additional_requests_id) REFERENCES Additional_Requests(additional_requests_id),
+        FOREIGN KEY(petitioner_id) REFERENCES People(person_id),
+        FOREIGN KEY(defendant_id) REFERENCES People(person_id),
+        FOREIGN KEY(court_id) REFERENCES Court(court_id)
+    )''')
+    c.execute('CREATE INDEX idx_petitions_court_id ON Petitions(court_id)')
+    # year_int, month_int and the analytic indexes are added after the load by index_petitions()
+    c.execute('''CREATE TABLE Petition_Reasoning_Lookup (
+        petition_id INTEGER,
+        reasoning_id INTEGER
+    )''')
+    c.execute('''CREATE TABLE People (
+        person_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        enslaver_status TEXT,
+        enslaver_scope_estimate TEXT,
+        UNIQUE(name, enslaver_status, enslaver_scope_estimate)
+    )''')
+    c.execute('''CREATE TABLE Petition_People_Lookup (
+        petition_id INTEGER,
+        person_id INTEGER
+    )''')
+    c.execute('''CREATE TABLE Reasoning (
+        reasoning_id INTEGER PRIMARY KEY,
+        reasoning TEXT,
+        party_accused TEXT
+    )''')
+    c.execute('''CREATE TABLE Archive_Lookup (
+        archive_id INTEGER PRIMARY KEY,
+        archive TEXT
+    )''')
+    # Court names repeat across states ('chancery', 'superior'), so a court is keyed per state
+    c.execute('''CREATE TABLE Court (
+        court_id INTEGER PRIMARY KEY,
+        court_name TEXT NOT NULL,
+        state TEXT,
+        UNIQUE(court_name, state)
+    )''')
+    c.execute('''CREATE TABLE Additional_Requests (
+        additional_requests_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        additional_requests TEXT UNIQUE
+    )''')
+    c.execute('''CREATE TABLE Geolocations (
+        geolocation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        county TEXT,
+        state TEXT,
+        latitude REAL,
+        longitude REAL,
+        UNIQUE(county, state)
+    )''')
+    c.execute('''CREATE TABLE Result (
+        petition_id INTEGER,
+        result TEXT
+    )''')
+    create_petition_source_table(c)
+    create_request_links(c)
+
+
+def create_petition_source_table(c):
+    """Create the table holding a hash of each petition's CSV row, used by incremental builds"""
+    c.execute('''CREATE TABLE IF NOT EXISTS Petition_Source (
+        petition_id INTEGER PRIMARY KEY,
+        row_hash TEXT NOT NULL
+    )''')
+
+
+def open_build_connection(db_path, conn=None):
+    """Return (conn, owned): the caller's connection when one is given, otherwise a
+    connection to a fresh database file at db_path that the builder must close."""
+    if conn is not None:
+        return build_stats.watch(conn), False
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    return build_stats.watch(sqlite3.connect(db_path)), True
+
+
+def publish_database(conn, db_path=DB_PATH):
+    """Copy a finished in-memory build to db_path with the SQLite backup API.
+
+    The copy is written to a temporary file in the same directory and renamed over
+    db_path, so readers only ever open either the previous or the complete new database.
+    """
+    with build_stats.stage('publish'):
+        conn.commit()
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(db_path) + '.', suffix='.tmp',
+                                        dir=os.path.dirname(os.path.abspath(db_path)))
+        os.close(fd)
+        try:
+            dest = sqlite3.connect(tmp_path)
+            dest.execute('PRAGMA journal_mode = OFF')
+            dest.execute('PRAGMA synchronous = OFF')
+            conn.backup(dest)
+            dest.close()
+            os.chmod(tmp_path, snapshots.replacement_mode(db_path))
+            os.replace(tmp_path, db_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    print('Published database to', db_path)
+
+
+def load_database(db_path, conn):
+    """Copy an existing database file into conn (e.g. an in-memory connection)"""
+    src = sqlite3.connect(db_path)
+    src.backup(conn)
+    src.close()
+
+
+def resolve_people(c, people_keys):
+    """Insert (name, enslaver_status, enslaver_scope_estimate) keys into People and return a
+    key -> person_id mapping.
+
+    Keys are loaded into a staging table with one executemany, inserted in their original
+    order with a single INSERT OR IGNORE ... SELECT, and read back with one join, so the
+    number of statements does not grow with the number of people.
+    """
+    with build_stats.stage('resolve_people') as stage:
+        stage['rows'] = len(people_keys)
+        c.execute('''CREATE TEMP TABLE People_Staging (
+            ord INTEGER PRIMARY KEY,
+            name TEXT,
+            enslaver_status TEXT,
+            enslaver_scope_estimate TEXT
+        )''')
+        c.executemany('INSERT INTO People_Staging (name, enslaver_status, enslaver_scope_estimate) VALUES (?, ?, ?)',
+                      people_keys)
+        c.execute('''
+        INSERT OR IGNORE INTO People (name, enslaver_status, enslaver_scope_estimate)
+        SELECT name, enslaver_status, enslaver_scope_estimate FROM People_Staging ORDER BY ord
+        ''')
+        person_key_to_id = {}
+        for name, status, scope, person_id in c.execute('''
+            SELECT s.name, s.enslaver_status, s.enslaver_scope_estimate, p.person_id
+            FROM People_Staging s
+            JOIN People p
+              ON p.name = s.name
+             AND p.enslaver_status = s.enslaver_status
+             AND p.enslaver_scope_estimate = s.enslaver_scope_estimate
+        '''):
+            person_key_to_id[(name, status, scope)] = person_id
+        c.execute('DROP TABLE People_Staging')
+        return person_key_to_id
+
+
+def build_database(csv_path=CSV_PATH, db_path=DB_PATH, conn=None):
+    """Row-loop ETL: read the whole CSV into memory and build each table in its own pass"""
+    rows = read_rows(csv_path)
+
+    # --- Reasoning and Petition_Reasoning_Lookup Tables ---
+    # Terms are normalized once (terminology replacement, (M)/(F) suffix) by the shared
+    # normalizer, which memoizes repeated terms.
+    reasoning = []
+    reasoning_id_map = {}
+    reasoning_id_counter = 1
+    petition_reasoning_lookup = []
+    for idx, row in enumerate(rows, 1):
+        for term, clean_term, party_accused in split_terms(row['reasoning']):
+            if term not in reasoning_id_map:
+                reasoning_id_map[term] = reasoning_id_counter
+                reasoning.append((reasoning_id_counter, clean_term, party_accused))
+                reasoning_id_counter += 1
+            petition_reasoning_lookup.append((idx, reasoning_id_map[term]))
+
+    # --- Initialize data structures for People and Petitions ---
+    people_set = set()
+    people = []
+    person_id_map = {}
+    person_id_counter = 1
+    petition_id_map = {}
+
+    # First create petition_id_map since it's needed for lookups
+    for idx, row in enumerate(rows, 1):
+        petition_id_map[row['parcel_number']] = idx
+
+    # Now process people
+    for row in rows:
+        enslaver_status = row.get('enslaver_status', '')
+        enslaver_scope = row.get('enslaver_scope_estimate', '')
+        for role in ['petitioner', 'defendant']:
+            name = row[role]
+            key = (name, enslaver_status, enslaver_scope)
+            if name and key not in people_set:
+                people_set.add(key)
+                person_id_map[key] = person_id_counter
+                people.append((person_id_counter, name, enslaver_status, enslaver_scope))
+                person_id_counter += 1
+
+    # --- Petition_People_Lookup Table ---
+    lookup = []
+    for row in rows:
+        parcel = row['parcel_number']
+        pid = petition_id_map[parcel]
+        enslaver_status = row.get('enslaver_status', '')
+        enslaver_scope = row.get('enslaver_scope_estimate', '')
+        for role in ['petitioner', 'defendant']:
+            name = row[role]
+            key = (name, enslaver_status, enslaver_scope)
+            if name:
+                lookup.append((pid, person_id_map[key]))
+
+    # --- Archive Lookup Table ---
+    archive_set = set()
+    archive = []
+    archive_id_map = {}
+    archive_id_counter = 1
+    for row in rows:
+        arch = row['archive'].strip()
+        if arch and arch not in archive_set:
+            archive_set.add(arch)
+            archive_id_map[arch] = archive_id_counter
+            archive.append((archive_id_counter, arch))
+            archive_id_counter += 1
+
+    # --- Court Table ---
+    court = []
+    court_id_map = {}
+    for row in rows:
+        key = court_key(row)
+        if key and key not in court_id_map:
+            court_id_map[key] = len(court_id_map) + 1
+            court.append((court_id_map[key],) + key)
+
+    # --- Additional Requests Table ---
+    addreq_set = set()
+    addreq = []
+    addreq_id_map = {}
+    addreq_id_counter = 1
+    for row in rows:
+        req = row['additional_requests'].strip()
+        if req and req not in addreq_set:
+            addreq_set.add(req)
+            addreq_id_map[req] = addreq_id_counter
+            addreq.append((addreq_id_counter, req))
+            addreq_id_counter += 1
+
+    # --- Create SQLite DB ---
+    conn, owned = open_build_connection(db_path, conn)
+    c = conn.cursor()
+    # Enforce foreign key constraints
+    c.execute('PRAGMA foreign_keys = ON')
+
+    create_schema(c)
+
+    # Insert Reasoning, Archive lookup and Court rows
+    c.executemany('INSERT INTO Reasoning VALUES (?, ?, ?)', reasoning)
+    c.executemany('INSERT INTO Archive_Lookup VALUES (?, ?)', archive)
+    c.executemany('INSERT INTO Court VALUES (?, ?, ?)', court)
+
+    # Insert people and build a mapping from (name,status,scope) -> person_id
+    person_key_to_id = resolve_people(c, [(name, status, scope) for _pid, name, status, scope in people])
+
+    # Rebuild Petition_People_Lookup using mapped person_ids (we'll insert after Petitions are created)
+    new_lookup = []
+    for row in rows:
+        parcel = row['parcel_number']
+        pid = petition_id_map[parcel]
+        enslaver_status = row.get('enslaver_status', '')
+        enslaver_scope = row.get('enslaver_scope_estimate', '')
+        for role in ['petitioner', 'defendant']:
+            name = row[role]
+            key = (name, enslaver_status, enslaver_scope)
+            new_person_id = person_key_to_id.get(key)
+            if new_person_id:
+                new_lookup.append((pid, new_person_id))
+
+
+    # --- Split Additional Requests into separate rows ---
+    split_addreq = []
+    for addreq_id, req in addreq:
+        if req:
+            requests = [r.strip() for r in req.split(',') if r.strip()]
+            for r in requests:
+                split_addreq.append((addreq_id, r))
+
+    # Insert only the split request text; allow the DB to assign unique IDs. Texts are
+    # deduplicated first: an ignored insert still uses up an AUTOINCREMENT id.
+    texts = [(r,) for r in dict.fromkeys(r for (_aid, r) in split_addreq)]
+    c.executemany('INSERT INTO Additional_Requests (additional_requests) VALUES (?)', texts)
+
+    # Build a map from the inserted additional_requests text -> their new autoincremented id
+    addreq_text_to_id = {}
+    addreq_exact_ids = {}
+    for aid, text in c.execute('SELECT additional_requests_id, additional_requests FROM Additional_Requests'):
+        if text:
+            addreq_text_to_id[text.lower()] = aid
+            addreq_exact_ids[text] = aid
+
+
+    # Create Petitions entries with person IDs and additional_requests_id
+    petitions = []
+    petition_id_map = {}
+    for idx, row in enumerate(rows, 1):
+        petition_id_map[row['parcel_number']] = idx
     
-    # Look up person_ids for petitioner and defendant
-    petitioner_key = (row['petitioner'], row.get('enslaver_status', ''), row.get('enslaver_scope_estimate', ''))
-    defendant_key = (row['defendant'], row.get('enslaver_status', ''), row.get('enslaver_scope_estimate', ''))
+        # Look up person_ids for petitioner and defendant
+        petitioner_key = (row['petitioner'], row.get('enslaver_status', ''), row.get('enslaver_scope_estimate', ''))
+        defendant_key = (row['defendant'], row.get('enslaver_status', ''), row.get('enslaver_scope_estimate', ''))
     
-    petitioner_id = person_key_to_id.get(petitioner_key)
-    defendant_id = person_key_to_id.get(defendant_key)
-
-    # Get additional_requests_id
-    addreq_text = row.get('additional_requests')
-    addreq_id = None
-    if addreq_text and isinstance(addreq_text, str):
-        parts = [p.strip().lower() for p in addreq_text.split(',') if p.strip()]
-        for p in parts:
-            if p in addreq_text_to_id:
-                addreq_id = addreq_text_to_id[p]
-                break
+        petitioner_id = person_key_to_id.get(petitioner_key)
+        defendant_id = person_key_to_id.get(defendant_key)
+
+        # Get additional_requests_id
+        addreq_text = row.get('additional_requests')
+        addreq_id = None
+        if addreq_text and isinstance(addreq_text, str):
+            parts = [p.strip().lower() for p in addreq_text.split(',') if p.strip()]
+            for p in parts:
+                if p in addreq_text_to_id:
+                    addreq_id = addreq_text_to_id[p]
+                    break
     
-    petitions.append((
-        idx,
-        row['parcel_number'],
-        row['archive'],
-        row['month'],
-        row['year'],
-        row['county'],
-        row['state'],
-        row['years_married'],
-        row.get('end_court'),
-        addreq_id,
-        petitioner_id,
-        defendant_id
-    ))
-
-c.executemany('INSERT INTO Petitions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', petitions)
-
-# Insert petition_reasoning_lookup (after Petitions exist)
-c.executemany('INSERT INTO Petition_Reasoning_Lookup VALUES (?, ?)', petition_reasoning_lookup)
-
-# Insert Petition_People_Lookup using mapped person IDs
-c.executemany('INSERT OR IGNORE INTO Petition_People_Lookup VALUES (?, ?)', new_lookup)
-
-# --- Result Table ---
-result_rows = []
-for idx, row in enumerate(rows, start=1):
-    result_cell = row.get('result')
-    if result_cell:
-        results = [r.strip() for r in result_cell.split(',') if r.strip()]
-        for res in results:
-            # Rename "denied" to "rejected"
-            if res.lower() == 'denied':
-                res = 'rejected'
-            result_rows.append((idx, res))
+        petitions.append((
+            idx,
+            row['parcel_number'],
+            row['archive'],
+            row['month'],
+            row['year'],
+            row['county'],
+            row['state'],
+            row['years_married'],
+            row.get('end_court'),
+            addreq_id,
+            petitioner_id,
+            defendant_id,
+            court_id_map.get(court_key(row))
+        ))
+
+    c.executemany('INSERT INTO Petitions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', petitions)
+
+    # Insert petition_reasoning_lookup (after Petitions exist)
+    c.executemany('INSERT INTO Petition_Reasoning_Lookup VALUES (?, ?)', petition_reasoning_lookup)
+
+    # Insert Petition_People_Lookup using mapped person IDs
+    c.executemany('INSERT OR IGNORE INTO Petition_People_Lookup VALUES (?, ?)', new_lookup)
+
+    # Every request of a petition, not just the first one stored on Petitions
+    c.executemany('INSERT INTO Petition_Requests_Lookup VALUES (?, ?)',
+                  [link for idx, row in enumerate(rows, 1)
+                   for link in request_links(idx, split_list(row['additional_requests']), addreq_exact_ids)])
+
+    # --- Result Table ---
+    result_rows = []
+    for idx, row in enumerate(rows, start=1):
+        result_cell = row.get('result')
+        if result_cell:
+            results = [r.strip() for r in result_cell.split(',') if r.strip()]
+            for res in results:
+                # Rename "denied" to "rejected"
+                if res.lower() == 'denied':
+                    res = 'rejected'
+                result_rows.append((idx, res))
+
+    c.executemany('INSERT INTO Result VALUES (?, ?)', result_rows)
+
+    # Record source row hashes so later incremental builds can diff against them
+    c.executemany('INSERT INTO Petition_Source VALUES (?, ?)',
+                  [(idx, row_hash(row)) for idx, row in enumerate(rows, 1)])
+
+    index_petitions(conn)
+    build_cube(conn)
+    build_search(conn)
+    build_bitmaps(conn)
+    migrations.record_build_migrations(conn)
+    conn.commit()
+    if owned:
+        conn.close()
+    print('Database created as', db_path if owned else 'in-memory build')
+    return len(petitions)
 
-c.execute('DROP TABLE IF EXISTS Result')
-c.execute('''CREATE TABLE Result (
-    petition_id INTEGER,
-    result TEXT
-)''')
-c.executemany('INSERT INTO Result VALUES (?, ?)', result_rows)
 
+def request_links(petition_id, requests, text_to_id):
+    """Petition_Requests_Lookup rows of one petition: each distinct request of its split
+    additional_requests cell, resolved through an exact text -> id map"""
+    return [(petition_id, text_to_id[text]) for text in dict.fromkeys(requests)]
 
-conn.commit()
-conn.close()
-print('Database created as', DB_PATH)
 
-def split_people_rows(db_path=DB_PATH):
-    """
-    Migration: if any `People.name` contains multiple names separated by commas,
-    split them into separate People rows and update Petition_People to point to
-    the new person_id values. Preserves enslaver_status and enslaver_scope_estimate.
+def build_database_streaming(csv_path=CSV_PATH, db_path=DB_PATH, batch_size=BATCH_SIZE, conn=None):
+    """Single-pass ETL: stream the CSV and resolve every dimension as rows arrive.
+
+    Produces the same tables and IDs as build_database(), but only the dimension
+    maps (reasoning terms, people keys, archives, request texts, parcels) are held in memory;
+    petitions and their lookup rows are written in executemany batches of batch_size.
     """
-    conn = sqlite3.connect(db_path)
+    conn, owned = open_build_connection(db_path, conn)
     c = conn.cursor()
-
-    # Read existing people and petition links
-    people = c.execute('SELECT person_id, name, enslaver_status, enslaver_scope_estimate FROM People').fetchall()
-    # table is Petition_People_Lookup with columns (petition_id, person_id)
-    links = c.execute('SELECT petition_id, person_id FROM Petition_People_Lookup').fetchall()
-
-    # Build mapping from old person_id -> list of new person_ids
-    new_people = []  # tuples (name, status, scope)
-    old_to_new = {}  # old_id -> [new_id, ...]
-
-    import re
-    for person_id, name, status, scope in people:
-        # split on commas, ampersands, the word ' and ', or semicolons
-        parts = [p.strip() for p in re.split(r"\s*(?:,|&| and |;)\s*", (name or '')) if p.strip()]
-        if len(parts) <= 1:
-            # keep as-is
-            old_to_new[person_id] = [person_id]
-            continue
-        # for multi-name entries, create new rows
-        created_ids = []
-        for i, part in enumerate(parts):
-            # preserve enslaver fields only for the first name
-            if i == 0:
-                es = status
-                esc = scope
-            else:
-                es = None
-                esc = None
-            c.execute('INSERT INTO People (name, enslaver_status, enslaver_scope_estimate) VALUES (?, ?, ?)',
-                      (part, es, esc))
-            created_ids.append(c.lastrowid)
-        old_to_new[person_id] = created_ids
-
-    # Now rebuild Petition_People_Lookup: insert links for new person_ids
-    for petition_id, person_id in links:
-        mapped = old_to_new.get(person_id, [person_id])
-        for new_id in mapped:
-            c.execute('INSERT OR IGNORE INTO Petition_People_Lookup (petition_id, person_id) VALUES (?, ?)',
-                      (petition_id, new_id))
-
-    # Remove any original rows that had multiple names (to avoid duplicates)
-    for person_id, name, status, scope in people:
-        parts = [p.strip() for p in re.split(r"\s*(?:,|&| and |;)\s*", (name or '')) if p.strip()]
-        if len(parts) > 1:
-            c.execute('DELETE FROM People WHERE person_id=?', (person_id,))
-
+    # Enforce foreign key constraints
+    c.execute('PRAGMA foreign_keys = ON')
+    create_schema(c)
+
+    # Dimension maps: natural key -> surrogate id
+    reasoning_id_map = {}
+    person_key_to_id = {}
+    archive_id_map = {}
+    court_id_map = {}
+    addreq_text_ids = {}      # exact request text -> id (mirrors the UNIQUE column)
+    addreq_lower_to_id = {}   # lowercased text -> latest id, as build_database() resolves it
+    addreq_first_part = {}    # raw additional_requests cell -> lowercased first request
+    addreq_remaps = []        # (old_id, new_id) when a later case variant takes over a lowercased key
+    parcel_last = {}          # parcel_number -> latest petition_id carrying it
+    parcel_remaps = []        # (petition_id, parcel_number) of petitions a later row shares a parcel with
+
+    # Pending batch rows, flushed dimensions-first so foreign keys always resolve
+    batch = {
+        'reasoning': [], 'archive': [], 'court': [], 'people': [], 'addreq': [],
+        'petitions': [], 'reasoning_lookup': [], 'people_lookup': [], 'request_lookup': [], 'result': [],
+        'source': [],
+    }
+
+    def flush():
+        c.executemany('INSERT INTO Reasoning VALUES (?, ?, ?)', batch['reasoning'])
+        c.executemany('INSERT INTO Archive_Lookup VALUES (?, ?)', batch['archive'])
+        c.executemany('INSERT INTO Court VALUES (?, ?, ?)', batch['court'])
+        c.executemany('INSERT INTO People VALUES (?, ?, ?, ?)', batch['people'])
+        c.executemany('INSERT INTO Additional_Requests VALUES (?, ?)', batch['addreq'])
+        c.executemany('INSERT INTO Petitions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', batch['petitions'])
+        c.executemany('INSERT INTO Petition_Reasoning_Lookup VALUES (?, ?)', batch['reasoning_lookup'])
+        c.executemany('INSERT INTO Petition_People_Lookup VALUES (?, ?)', batch['people_lookup'])
+        c.executemany('INSERT INTO Petition_Requests_Lookup VALUES (?, ?)', batch['request_lookup'])
+        c.executemany('INSERT INTO Result VALUES (?, ?)', batch['result'])
+        c.executemany('INSERT INTO Petition_Source VALUES (?, ?)', batch['source'])
+        for pending in batch.values():
+            pending.clear()
+
+    idx = 0
+    for idx, row in enumerate(iter_rows(csv_path), 1):
+        parcel = row['parcel_number']
+        if parcel in parcel_last:
+            parcel_remaps.append((parcel_last[parcel], parcel))
+        parcel_last[parcel] = idx
+
+        # Reasoning terms and Petition_Reasoning_Lookup
+        for term, clean_term, party_accused in split_terms(row['reasoning']):
+            reasoning_id = reasoning_id_map.get(term)
+            if reasoning_id is None:
+                reasoning_id = reasoning_id_map[term] = len(reasoning_id_map) + 1
+                batch['reasoning'].append((reasoning_id, clean_term, party_accused))
+            batch['reasoning_lookup'].append((idx, reasoning_id))
+
+        # People and Petition_People_Lookup
+        enslaver_status = row.get('enslaver_status', '')
+        enslaver_scope = row.get('enslaver_scope_estimate', '')
+        role_ids = {}
+        for role in ['petitioner', 'defendant']:
+            name = row[role]
+            if not name:
+                role_ids[role] = None
+                continue
+            key = (name, enslaver_status, enslaver_scope)
+            person_id = person_key_to_id.get(key)
+            if person_id is None:
+                person_id = person_key_to_id[key] = len(person_key_to_id) + 1
+                batch['people'].append((person_id, name, enslaver_status, enslaver_scope))
+            role_ids[role] = person_id
+            batch['people_lookup'].append((idx, person_id))
+
+        # Archive_Lookup
+        arch = row['archive'].strip()
+        if arch and arch not in archive_id_map:
+            archive_id_map[arch] = len(archive_id_map) + 1
+            batch['archive'].append((archive_id_map[arch], arch))
+
+        # Court
+        key = court_key(row)
+        if key and key not in court_id_map:
+            court_id_map[key] = len(court_id_map) + 1
+            batch['court'].append((court_id_map[key],) + key)
+
+        # Additional_Requests: each distinct cell is split once
+        req = row['additional_requests'].strip()
+        if req and req not in addreq_first_part:
+            parts = split_list(req)
+            for part in parts:
+                if part in addreq_text_ids:
+                    continue
+                addreq_id = addreq_text_ids[part] = len(addreq_text_ids) + 1
+                batch['addreq'].append((addreq_id, part))
+                lowered = part.lower()
+                if lowered in addreq_lower_to_id:
+                    addreq_remaps.append((addreq_lower_to_id[lowered], addreq_id))
+                addreq_lower_to_id[lowered] = addreq_id
+            addreq_first_part[req] = parts[0].lower() if parts else None
+        first_part = addreq_first_part.get(req) if req else None
+        addreq_id = addreq_lower_to_id.get(first_part) if first_part else None
+        batch['request_lookup'].extend(request_links(idx, split_list(req), addreq_text_ids))
+
+        batch['petitions'].append((
+            idx,
+            row['parcel_number'],
+            row['archive'],
+            row['month'],
+            row['year'],
+            row['county'],
+            row['state'],
+            row['years_married'],
+            row.get('end_court'),
+            addreq_id,
+            role_ids['petitioner'],
+            role_ids['defendant'],
+            court_id_map.get(key)
+        ))
+
+        # Result, renaming "denied" to "rejected"
+        for res in split_list(row.get('result')):
+            if res.lower() == 'denied':
+                res = 'rejected'
+            batch['result'].append((idx, res))
+
+        batch['source'].append((idx, row_hash(row)))
+
+        if len(batch['petitions']) >= batch_size:
+            flush()
+    flush()
+
+    # A petition points at the newest request whose lowercased text matches, so
+    # follow any case variants that were inserted after the petition was written.
+    for old_id, new_id in addreq_remaps:
+        c.execute('UPDATE Petitions SET additional_requests_id=? WHERE additional_requests_id=?', (new_id, old_id))
+
+    # build_database() links people to the last petition carrying a parcel_number;
+    # repeat that for duplicated parcels now that every petition has been written.
+    if parcel_remaps:
+        c.execute('CREATE TEMP TABLE Parcel_Remap (petition_id INTEGER PRIMARY KEY, last_petition_id INTEGER)')
+        c.executemany('INSERT INTO Parcel_Remap VALUES (?, ?)',
+                      [(old_id, parcel_last[parcel]) for old_id, parcel in parcel_remaps])
+        c.execute('''
+        UPDATE Petition_People_Lookup
+        SET petition_id = (SELECT last_petition_id FROM Parcel_Remap r
+                           WHERE r.petition_id = Petition_People_Lookup.petition_id)
+        WHERE petition_id IN (SELECT petition_id FROM Parcel_Remap)
+        ''')
+        c.execute('DROP TABLE Parcel_Remap')
+
+    index_petitions(conn)
+    build_cube(conn)
+    build_search(conn)
+    build_bitmaps(conn)
+    migrations.record_build_migrations(conn)
     conn.commit()
-    conn.close()
-    print('Split multi-name People rows and updated Petition_People links.')
+    if owned:
+        conn.close()
+    print(f"Database created as {db_path if owned else 'in-memory build'} ({idx} petitions streamed)")
+    return idx
 
 
-def migrate_people_inplace(db_path=DB_PATH):
-    """Safe in-place migration wrapper: creates a timestamped backup then runs the
-    split logic using the same semantics as split_people_rows()."""
-    if not os.path.exists(db_path):
-        raise SystemExit(f"Database {db_path} not found")
-    ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    bak = f"{db_path}.bak.{ts}"
-    shutil.copy2(db_path, bak)
-    print('Backup created:', bak)
+def build_database_incremental(csv_path=CSV_PATH, db_path=DB_PATH, conn=None):
+    """Incremental ETL: diff the CSV against the existing database by parcel_number.
 
-    # Disable foreign keys while we mutate link tables
-    conn = sqlite3.connect(db_path)
-    conn.execute('PRAGMA foreign_keys = OFF')
+    Petitions whose parcel is new or whose CSV rows changed are upserted together with
+    their lookup (reasoning, people, requests) and Result rows; parcels that
+    disappeared from the CSV are deleted. Unchanged petitions keep their petition_id and
+    are not touched. Falls back to a full build when the database does not exist yet.
+    When conn is given it is updated instead of the file at db_path.
+    """
+    owned = conn is None
+    if owned and not os.path.exists(db_path):
+        print(f'{db_path} not found; running a full build')
+        return build_database(csv_path, db_path)
+    if not owned and not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'Petitions'").fetchone():
+        print('No existing petitions to diff against; running a full build')
+        return build_database(csv_path, db_path, conn)
+
+    # Group incoming rows by parcel; a parcel may carry more than one petition
+    incoming = defaultdict(list)
+    for row in iter_rows(csv_path):
+        incoming[row['parcel_number']].append((row, row_hash(row)))
+
+    if owned:
+        conn = sqlite3.connect(db_path)
+    build_stats.watch(conn)
     c = conn.cursor()
-
-    people = c.execute('SELECT person_id, name, enslaver_status, enslaver_scope_estimate FROM People').fetchall()
-    links = c.execute('SELECT petition_id, person_id FROM Petition_People_Lookup').fetchall()
-
-    old_to_new = {}
-    import re
-    for person_id, name, status, scope in people:
-        if not name or (',' not in name and '&' not in name and ' and ' not in name and ';' not in name):
-            old_to_new[person_id] = [person_id]
-            continue
-        parts = [p.strip() for p in re.split(r"\s*(?:,|&| and |;)\s*", name) if p.strip()]
-        created_ids = []
-        for i, part in enumerate(parts):
-            if i == 0:
-                es = status
-                esc = scope
-            else:
-                es = None
-                esc = None
-
-            if es is None and esc is None:
-                row = c.execute(
-                    "SELECT person_id FROM People WHERE name=? AND enslaver_status IS NULL AND enslaver_scope_estimate IS NULL",
-                    (part,)
-                ).fetchone()
+    c.execute('PRAGMA foreign_keys = ON')
+    # Databases built before Petition_Source existed are treated as fully changed once
+    create_petition_source_table(c)
+    # Databases built before Petition_Requests_Lookup get it here, linked to each petition's first request
+    create_request_links(conn)
+    # Databases built before the Court dimension get it here (a no-op when it exists)
+    migrations.create_court_table(conn)
+
+    existing = defaultdict(list)
+    for parcel, petition_id, h in c.execute('''
+        SELECT p.parcel_number, p.petition_id, s.row_hash
+        FROM Petitions p
+        LEFT JOIN Petition_Source s ON s.petition_id = p.petition_id
+        ORDER BY p.petition_id
+    '''):
+        existing[parcel].append((petition_id, h))
+
+    removed = [parcel for parcel in existing if parcel not in incoming]
+    changed = [parcel for parcel in existing if parcel in incoming
+               and [h for _pid, h in existing[parcel]] != [h for _row, h in incoming[parcel]]]
+    added = [parcel for parcel in incoming if parcel not in existing]
+
+    if not (removed or changed or added):
+        if owned:
+            conn.close()
+        print('Database is up to date; no petitions changed')
+        return 0
+
+    # Clear every petition belonging to a removed or changed parcel in one set-based pass
+    stale_ids = [(pid,) for parcel in removed + changed for pid, _h in existing[parcel]]
+    c.execute('CREATE TEMP TABLE Stale_Petitions (petition_id INTEGER PRIMARY KEY)')
+    c.executemany('INSERT INTO Stale_Petitions VALUES (?)', stale_ids)
+    for table in ['Petition_Reasoning_Lookup', 'Petition_People_Lookup', 'Petition_Requests_Lookup', 'Result',
+                  'Petition_Source', 'Petitions']:
+        c.execute(f'DELETE FROM {table} WHERE petition_id IN (SELECT petition_id FROM Stale_Petitions)')
+    c.execute('DROP TABLE Stale_Petitions')
+
+    # Changed parcels reuse their petition_ids; anything beyond that gets a fresh id
+    next_id = (c.execute('SELECT MAX(petition_id) FROM Petitions').fetchone()[0] or 0)
+    next_id = max([next_id] + [pid for (pid,) in stale_ids]) + 1
+    upserts = []  # (petition_id, row, hash, parcel_petition_id)
+    for parcel in changed + added:
+        reused = [pid for pid, _h in existing.get(parcel, [])]
+        ids = []
+        for i, (row, h) in enumerate(incoming[parcel]):
+            if i < len(reused):
+                ids.append(reused[i])
             else:
-                row = c.execute(
-                    'SELECT person_id FROM People WHERE name=? AND enslaver_status=? AND enslaver_scope_estimate=?',
-                    (part, es, esc)
-                ).fetchone()
+                ids.append(next_id)
+                next_id += 1
+        # People are linked to the last petition carrying the parcel, as in build_database()
+        for pid, (row, h) in zip(ids, incoming[parcel]):
+            upserts.append((pid, row, h, ids[-1]))
+
+    # --- Reasoning: extend the existing term map ---
+    reasoning_id_map = load_reasoning_ids(conn)
+    next_reasoning_id = max(reasoning_id_map.values(), default=0) + 1
+    new_reasoning = []
+    petition_reasoning_lookup = []
+    for pid, row, _h, _ppid in upserts:
+        for term, clean_term, party_accused in split_terms(row['reasoning']):
+            if term not in reasoning_id_map:
+                reasoning_id_map[term] = next_reasoning_id
+                new_reasoning.append((next_reasoning_id, clean_term, party_accused))
+                next_reasoning_id += 1
+            petition_reasoning_lookup.append((pid, reasoning_id_map[term]))
+    c.executemany('INSERT INTO Reasoning VALUES (?, ?, ?)', new_reasoning)
+
+    # --- Archive_Lookup ---
+    archive_id_map = {arch: aid for aid, arch in c.execute('SELECT archive_id, archive FROM Archive_Lookup')}
+    next_archive_id = max(archive_id_map.values(), default=0) + 1
+    new_archives = []
+    for _pid, row, _h, _ppid in upserts:
+        arch = row['archive'].strip()
+        if arch and arch not in archive_id_map:
+            archive_id_map[arch] = next_archive_id
+            new_archives.append((next_archive_id, arch))
+            next_archive_id += 1
+    c.executemany('INSERT INTO Archive_Lookup VALUES (?, ?)', new_archives)
+
+    # --- Court ---
+    court_id_map = {(name, state): cid for cid, name, state in c.execute('SELECT court_id, court_name, state FROM Court')}
+    next_court_id = max(court_id_map.values(), default=0) + 1
+    new_courts = []
+    for _pid, row, _h, _ppid in upserts:
+        key = court_key(row)
+        if key and key not in court_id_map:
+            court_id_map[key] = next_court_id
+            new_courts.append((next_court_id,) + key)
+            next_court_id += 1
+    c.executemany('INSERT INTO Court (court_id, court_name, state) VALUES (?, ?, ?)', new_courts)
+
+    # --- People ---
+    people_keys = [(row[role], row.get('enslaver_status', ''), row.get('enslaver_scope_estimate', ''))
+                   for _pid, row, _h, _ppid in upserts for role in ['petitioner', 'defendant'] if row[role]]
+    person_key_to_id = resolve_people(c, people_keys)
+
+    # --- Additional_Requests ---
+    def load_addreq_text_to_id():
+        text_to_id = {}
+        for aid, text in c.execute('SELECT additional_requests_id, additional_requests FROM Additional_Requests ORDER BY additional_requests_id'):
+            if text:
+                text_to_id[text.lower()] = aid
+        return text_to_id
+
+    previous_addreq_ids = load_addreq_text_to_id()
+    # Only new texts are inserted, since an ignored insert still uses up an AUTOINCREMENT id
+    existing_texts = {text for (text,) in c.execute('SELECT additional_requests FROM Additional_Requests')}
+    texts = dict.fromkeys(part for _pid, row, _h, _ppid in upserts for part in split_list(row['additional_requests']))
+    c.executemany('INSERT INTO Additional_Requests (additional_requests) VALUES (?)',
+                  [(text,) for text in texts if text not in existing_texts])
+    addreq_text_to_id = load_addreq_text_to_id()
+    addreq_exact_ids = dict(c.execute('SELECT additional_requests, additional_requests_id FROM Additional_Requests'))
+    # A new case variant of an existing request takes over its lowercased key, as in a full build
+    for lowered, old_id in previous_addreq_ids.items():
+        if addreq_text_to_id[lowered] != old_id:
+            c.execute('UPDATE Petitions SET additional_requests_id=? WHERE additional_requests_id=?',
+                      (addreq_text_to_id[lowered], old_id))
+
+    # --- Petitions and their lookup rows ---
+    petitions = []
+    people_lookup = []
+    request_lookup = []
+    result_rows = []
+    source = []
+    for pid, row, h, parcel_pid in upserts:
+        enslaver_status = row.get('enslaver_status', '')
+        enslaver_scope = row.get('enslaver_scope_estimate', '')
+        role_ids = {}
+        for role in ['petitioner', 'defendant']:
+            role_ids[role] = person_key_to_id.get((row[role], enslaver_status, enslaver_scope))
+            if role_ids[role]:
+                people_lookup.append((parcel_pid, role_ids[role]))
+        parts = split_list(row['additional_requests'])
+        addreq_id = addreq_text_to_id.get(parts[0].lower()) if parts else None
+        request_lookup.extend(request_links(pid, parts, addreq_exact_ids))
+        petitions.append((
+            pid,
+            row['parcel_number'],
+            row['archive'],
+            row['month'],
+            row['year'],
+            row['county'],
+            row['state'],
+            row['years_married'],
+            row.get('end_court'),
+            addreq_id,
+            role_ids['petitioner'],
+            role_ids['defendant'],
+            court_id_map.get(court_key(row))
+        ))
+        for res in split_list(row.get('result')):
+            if res.lower() == 'denied':
+                res = 'rejected'
+            result_rows.append((pid, res))
+        source.append((pid, h))
+
+    # Columns are named because databases migrated from older builds order them differently
+    c.executemany('''INSERT INTO Petitions (petition_id, parcel_number, archive, month, year, county, state,
+                  years_married, court, additional_requests_id, petitioner_id, defendant_id, court_id)
+                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', petitions)
+    c.executemany('INSERT INTO Petition_Reasoning_Lookup VALUES (?, ?)', petition_reasoning_lookup)
+    c.executemany('INSERT INTO Petition_People_Lookup VALUES (?, ?)', people_lookup)
+    c.executemany('INSERT INTO Petition_Requests_Lookup VALUES (?, ?)', request_lookup)
+    c.executemany('INSERT INTO Result VALUES (?, ?)', result_rows)
+    c.executemany('INSERT INTO Petition_Source VALUES (?, ?)', source)
+    # The data migrations must run again over the upserted rows
+    migrations.forget_data_migrations(conn)
+
+    index_petitions(conn)
+    # A cube or search index that already exists was kept current by its triggers during the upsert
+    ensure_cube(conn)
+    ensure_search(conn)
+    build_bitmaps(conn)
+    migrations.record_build_migrations(conn)
+    conn.commit()
+    if owned:
+        conn.close()
+    print(f'Database updated in place: {len(added)} parcels added, {len(changed)} changed, {len(removed)} removed')
+    return len(petitions)
 
-            if row:
-                created_ids.append(row[0])
-            else:
-                c.execute(
-                    'INSERT INTO People (name, enslaver_status, enslaver_scope_estimate) VALUES (?, ?, ?)',
-                    (part, es, esc)
-                )
-                created_ids.append(c.lastrowid)
 
-        old_to_new[person_id] = created_ids
+def build_database_sharded(csv_paths, db_path=DB_PATH, workers=None, conn=None):
+    """Multi-file ETL: parse each shard CSV in a process pool, merge the dimensions into
+    global ids, then bulk-load everything in one transaction.
 
-    for petition_id, old_person_id in links:
-        mapped = old_to_new.get(old_person_id, [old_person_id])
-        for new_pid in mapped:
-            c.execute('INSERT OR IGNORE INTO Petition_People_Lookup (petition_id, person_id) VALUES (?, ?)', (petition_id, new_pid))
+    Shards are ordered by path before petition ids are assigned, so the resulting
+    database is the same whatever order the files are listed in.
+    """
+    csv_paths = sorted(os.path.normpath(p) for p in csv_paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        shards = list(executor.map(parse_shard, csv_paths))
+    ids = merge_shards(shards)
+    reasoning_id_map = ids['reasoning_id_map']
+    person_key_to_id = ids['person_key_to_id']
+    addreq_text_ids = ids['addreq_text_ids']
+    addreq_lower_to_id = ids['addreq_lower_to_id']
+    court_id_map = ids['court_id_map']
+
+    records = [record for shard in shards for record in shard['records']]
+    # People are linked to the last petition carrying a parcel_number, as in build_database()
+    petition_id_map = {}
+    for idx, record in enumerate(records, 1):
+        petition_id_map[record[0][0]] = idx
+
+    petitions = []
+    petition_reasoning_lookup = []
+    people_lookup = []
+    request_lookup = []
+    result_rows = []
+    source = []
+    for idx, (fields, terms, people_keys, requests, court, results, h) in enumerate(records, 1):
+        for term in terms:
+            petition_reasoning_lookup.append((idx, reasoning_id_map[term]))
+        role_ids = [person_key_to_id[key] if key else None for key in people_keys]
+        for person_id in role_ids:
+            if person_id:
+                people_lookup.append((petition_id_map[fields[0]], person_id))
+        addreq_id = addreq_lower_to_id.get(requests[0].lower()) if requests else None
+        request_lookup.extend(request_links(idx, requests, addreq_text_ids))
+        petitions.append((idx,) + fields + (addreq_id, role_ids[0], role_ids[1], court_id_map.get(court)))
+        for res in results:
+            result_rows.append((idx, res))
+        source.append((idx, h))
+
+    conn, owned = open_build_connection(db_path, conn)
+    c = conn.cursor()
+    # Enforce foreign key constraints
+    c.execute('PRAGMA foreign_keys = ON')
+    create_schema(c)
+
+    c.executemany('INSERT INTO Reasoning VALUES (?, ?, ?)',
+                  [(rid, *ids['reasoning'][term]) for term, rid in reasoning_id_map.items()])
+    c.executemany('INSERT INTO Archive_Lookup VALUES (?, ?)',
+                  [(aid, arch) for arch, aid in ids['archive_id_map'].items()])
+    c.executemany('INSERT INTO Court VALUES (?, ?, ?)',
+                  [(cid, *key) for key, cid in court_id_map.items()])
+    c.executemany('INSERT INTO People VALUES (?, ?, ?, ?)',
+                  [(pid, *key) for key, pid in person_key_to_id.items()])
+    c.executemany('INSERT INTO Additional_Requests VALUES (?, ?)',
+                  [(aid, text) for text, aid in addreq_text_ids.items()])
+    c.executemany('INSERT INTO Petitions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', petitions)
+    c.executemany('INSERT INTO Petition_Reasoning_Lookup VALUES (?, ?)', petition_reasoning_lookup)
+    c.executemany('INSERT INTO Petition_People_Lookup VALUES (?, ?)', people_lookup)
+    c.executemany('INSERT INTO Petition_Requests_Lookup VALUES (?, ?)', request_lookup)
+    c.executemany('INSERT INTO Result VALUES (?, ?)', result_rows)
+    c.executemany('INSERT INTO Petition_Source VALUES (?, ?)', source)
+
+    index_petitions(conn)
+    build_cube(conn)
+    build_search(conn)
+    build_bitmaps(conn)
+    migrations.record_build_migrations(conn)
+    conn.commit()
+    if owned:
+        conn.close()
+    print(f"Database created as {db_path if owned else 'in-memory build'} ({len(petitions)} petitions from {len(csv_paths)} shards)")
+    return len(petitions)
 
-    import re as _re
-    for person_id, name, status, scope in people:
-        parts = [p.strip() for p in _re.split(r"\s*(?:,|&| and |;)\s*", (name or '')) if p.strip()]
-        if len(parts) > 1:
-            c.execute('DELETE FROM People WHERE person_id=?', (person_id,))
 
+def split_people_rows(db_path=DB_PATH):
+    """
+    Migration: if any `People.name` contains multiple names separated by commas,
+    ampersands, ' and ' or semicolons, split them into separate People rows and
+    update Petition_People_Lookup to point to the new person_id values. Preserves
+    enslaver_status and enslaver_scope_estimate for the first name.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA foreign_keys = OFF')
+    split_people(conn)
     conn.commit()
     conn.close()
-    print('In-place people migration completed.')
+    print('Split multi-name People rows and updated Petition_People links.')
+
+
+def migrate_inplace(db_path=DB_PATH):
+    """Apply pending migrations to the database file, after taking a snapshot of it.
+    No snapshot is taken when every migration is already recorded in schema_migrations."""
+    if not os.path.exists(db_path):
+        raise SystemExit(f"Database {db_path} not found")
+    conn = build_stats.watch(sqlite3.connect(db_path))
+    if migrations.pending_migrations(conn):
+        with build_stats.stage('backup'):
+            snapshots.take_snapshot(db_path, label='before migrations', conn=conn)
+    migrations.run_migrations(conn)
+    conn.close()
 
 
 def main():
     parser = argparse.ArgumentParser(description='Create normalized dv_petitions.db and optionally run migrations')
-    parser.add_argument('--migrate-people', action='store_true', help='Run People-splitting migration in-place (creates backup)')
-    parser.add_argument('--no-migrate', action='store_true', help='Do not run the people-splitting migration after ETL')
+    parser.add_argument('--csv', default=CSV_PATH, help='Transcription CSV to load (default: %(default)s)')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--stream', action='store_true', help='Build with the single-pass streaming ETL (flat memory on large CSVs)')
+    mode.add_argument('--shards', nargs='+', metavar='CSV', help='Build from several state/archive CSV shards parsed in parallel (ignores --csv)')
+    mode.add_argument('--incremental', action='store_true', help='Upsert only new or changed parcels into the existing database instead of rebuilding it')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per executemany batch with --stream (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for --shards (default: all cores)')
+    parser.add_argument('--in-memory', action='store_true', help='Build and migrate in memory, then publish atomically over the database file')
+    parser.add_argument('--migrate', '--migrate-people', dest='migrate', action='store_true',
+                        help='Apply pending migrations in place (creates a backup) and skip geocoding')
+    parser.add_argument('--no-migrate', action='store_true', help='Do not run the migrations after ETL')
+    parser.add_argument('--export', nargs='?', const='', metavar='DIR',
+                        help='Finally refresh the Parquet export of the petitions (petition_export.py); '
+                             'changed state partitions only (default DIR: dv_petitions_parquet)')
+    parser.add_argument('--log', default=build_stats.LOG_PATH, help='File per-stage timings are appended to as JSON lines (default: %(default)s)')
+    parser.add_argument('--profile', nargs='?', const='build_profiles', metavar='DIR',
+                        help='Also dump a cProfile file per stage into DIR (default: %(const)s)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Also log each stage's tracemalloc peak (slows the build down)")
     args = parser.parse_args()
-    # If user explicitly requests migration, run it.
-    if args.migrate_people:
-        migrate_people_inplace(DB_PATH)
-        return
-
-    # If user opts out, do nothing further.
-    if args.no_migrate:
-        print('Skipping people migration (--no-migrate)')
-        return
-
-    # Default behavior: run people migration after building the DB so split names are applied.
-    print('Running people migration by default (use --no-migrate to skip)')
-    migrate_people_inplace(DB_PATH)
-    
-    # Run geocoding script to populate Geolocations table
-    print('Geocoding counties...')
-    import geocode_counties
-    geocode_counties.main()
 
+    build_stats.configure(args.log, args.profile, args.trace_memory)
+
+    # With --in-memory every builder writes to this connection instead of DB_PATH
+    conn = sqlite3.connect(':memory:') if args.in_memory else None
+    if conn is not None and args.incremental and os.path.exists(DB_PATH):
+        load_database(DB_PATH, conn)
+
+    with build_stats.stage('build') as stage:
+        if args.shards:
+            stage['rows'] = build_database_sharded(args.shards, DB_PATH, args.workers, conn=conn)
+        elif args.incremental:
+            stage['rows'] = build_database_incremental(args.csv, DB_PATH, conn=conn)
+        elif args.stream:
+            stage['rows'] = build_database_streaming(args.csv, DB_PATH, args.batch_size, conn=conn)
+        else:
+            stage['rows'] = build_database(args.csv, DB_PATH, conn=conn)
+
+    if conn is not None:
+        # Migrations run against the in-memory copy, so no backup file is needed
+        if not args.no_migrate:
+            print('Running pending migrations in memory')
+            build_stats.watch(conn)
+            migrations.run_migrations(conn)
+        publish_database(conn, DB_PATH)
+        conn.close()
+        geocode = not (args.no_migrate or args.migrate)
+    elif args.migrate:
+        # If user explicitly requests migration, run it.
+        migrate_inplace(DB_PATH)
+        geocode = False
+    elif args.no_migrate:
+        # If user opts out, do nothing further.
+        print('Skipping migrations (--no-migrate)')
+        geocode = False
+    else:
+        # Default behavior: bring the new DB up to date so split names, courts etc. are applied.
+        print('Running pending migrations by default (use --no-migrate to skip)')
+        migrate_inplace(DB_PATH)
+        geocode = True
+
+    if geocode:
+        # Run geocoding script to populate Geolocations table
+        print('Geocoding counties...')
+        import geocode_counties
+        geocode_counties.main()
+
+    if args.export is not None:
+        import petition_export
+        petition_export.export_petitions(DB_PATH, args.export or None)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,125 @@
+"""
+Shard workers for database.db.py's multi-file ETL (build_database_sharded).
+
+parse_shard() runs in a process pool, which pickles workers by module and name.
+database.db.py cannot be imported by name (its file name has a dot in it), so the
+workers and the CSV row helpers they share with the other builders live here.
+"""
+
+import csv
+import hashlib
+import json
+
+from reasoning_normalizer import split_terms
+
+
+def iter_rows(csv_path):
+    """Yield CSV rows one at a time with whitespace cleaned from headers and cells"""
+    with open(csv_path, newline='', encoding='utf-8') as csvfile:
+        reader = csv.DictReader(csvfile)
+        # Clean header names
+        reader.fieldnames = [h.strip() for h in reader.fieldnames]
+        for row in reader:
+            yield {k.strip(): v.strip() for k, v in row.items()}
+
+
+def court_key(row):
+    """(court_name, state) of the court a petition ended in, or None when end_court is empty"""
+    court_name = (row.get('end_court') or '').strip()
+    return (court_name, row['state']) if court_name else None
+
+
+def row_hash(row):
+    """Stable content hash of a cleaned CSV row"""
+    return hashlib.sha1(json.dumps(row, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def split_list(cell):
+    """Split a comma-separated CSV cell into its stripped, non-empty items"""
+    return [t.strip() for t in (cell or '').split(',') if t.strip()]
+
+
+def parse_shard(csv_path):
+    """Process-pool worker: parse and normalize one shard CSV.
+
+    Returns the shard's petition records together with the dimension keys they use.
+    No ids are assigned here; merge_shards() does that once all shards are parsed.
+    """
+    records = []
+    reasoning = {}  # term -> (clean_term, party_accused)
+    people = set()
+    archives = set()
+    courts = set()
+    addreq = set()
+    for row in iter_rows(csv_path):
+        terms = []
+        for term, clean_term, party_accused in split_terms(row['reasoning']):
+            if term not in reasoning:
+                reasoning[term] = (clean_term, party_accused)
+            terms.append(term)
+
+        enslaver_status = row.get('enslaver_status', '')
+        enslaver_scope = row.get('enslaver_scope_estimate', '')
+        people_keys = []
+        for role in ['petitioner', 'defendant']:
+            name = row[role]
+            key = (name, enslaver_status, enslaver_scope) if name else None
+            if key:
+                people.add(key)
+            people_keys.append(key)
+
+        arch = row['archive'].strip()
+        if arch:
+            archives.add(arch)
+
+        court = court_key(row)
+        if court:
+            courts.add(court)
+
+        parts = split_list(row['additional_requests'])
+        addreq.update(parts)
+
+        results = ['rejected' if res.lower() == 'denied' else res for res in split_list(row.get('result'))]
+
+        fields = (row['parcel_number'], row['archive'], row['month'], row['year'], row['county'],
+                  row['state'], row['years_married'], row.get('end_court'))
+        records.append((fields, terms, people_keys, parts, court, results, row_hash(row)))
+
+    return {
+        'path': csv_path,
+        'records': records,
+        'reasoning': reasoning,
+        'people': people,
+        'archives': archives,
+        'courts': courts,
+        'addreq': addreq,
+    }
+
+
+def merge_shards(shards):
+    """Merge per-shard dimension keys into global id maps.
+
+    Ids are assigned in sorted key order, so they depend only on which keys exist and
+    never on the order shards were given or finished in.
+    """
+    reasoning = {}
+    for shard in shards:
+        reasoning.update(shard['reasoning'])
+    reasoning_id_map = {term: i for i, term in enumerate(sorted(reasoning), 1)}
+    person_key_to_id = {key: i for i, key in enumerate(sorted(set().union(*(s['people'] for s in shards))), 1)}
+    archive_id_map = {arch: i for i, arch in enumerate(sorted(set().union(*(s['archives'] for s in shards))), 1)}
+    court_id_map = {key: i for i, key in enumerate(sorted(set().union(*(s['courts'] for s in shards))), 1)}
+    addreq_text_ids = {text: i for i, text in enumerate(sorted(set().union(*(s['addreq'] for s in shards))), 1)}
+    # As in build_database(), a lowercased request resolves to the highest id carrying it
+    addreq_lower_to_id = {}
+    for text, aid in addreq_text_ids.items():
+        addreq_lower_to_id[text.lower()] = aid
+    return {
+        'reasoning': reasoning,
+        'reasoning_id_map': reasoning_id_map,
+        'person_key_to_id': person_key_to_id,
+        'archive_id_map': archive_id_map,
+        'court_id_map': court_id_map,
+        'addreq_text_ids': addreq_text_ids,
+        'addreq_lower_to_id': addreq_lower_to_id,
+    }
@@ -1,21 +1,152 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, g, render_template, jsonify, request, stream_with_context
+from collections import OrderedDict
+import csv
+import functools
+import hashlib
+import io
+import json
+import os
+import queue
 import sqlite3
-import plotly
-import plotly.graph_objs as go
-import plotly.express as px
+import sys
+import threading
 import pandas as pd
-import json
+from urllib.request import pathname2url
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from petition_search import search
+from reasoning_normalizer import load_reasoning_ids, normalize_term, stored_term
+from figure_json import bar_figure, dumps, figure_json, line_figure, pie_figure
 
 app = Flask(__name__)
 
-# Database path
-DB_PATH = '../dv_petitions.db.bak'
+# Page size of /api/search when per_page is not given, and its upper bound
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
 
-def get_db_connection():
-    """Create a database connection"""
-    conn = sqlite3.connect(DB_PATH)
+# Page size of /data/petitions when limit is not given, its upper bound, and the
+# keyset batch size of its NDJSON and CSV streams
+PETITIONS_PAGE_SIZE = 100
+PETITIONS_MAX_PAGE_SIZE = 1000
+PETITIONS_STREAM_BATCH = 500
+
+# Database path (the database built in the repository root)
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dv_petitions.db')
+
+# Counts come from Agg_Petition_Cube (petition_cube.py). Its rollup rows count every
+# petition once: reasoning_id 0 stands for all reasons and result '*' for all results.
+PETITION_TOTALS = "reasoning_id = 0 AND result = '*'"
+
+# Read-only connections are pooled across requests, so a request does not pay for
+# opening the file and parsing the schema, and starts with a warm page cache
+POOL_SIZE = 8
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KIB = 64 * 1024
+CACHED_STATEMENTS = 256
+
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+def database_id():
+    """Identifies the database file; a rebuild published over it gets a new inode"""
+    return os.stat(DB_PATH).st_ino
+
+def open_db_connection():
+    """Open a tuned read-only connection; returns (connection, database_id)"""
+    uri = 'file:' + pathname2url(os.path.abspath(DB_PATH)) + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
     conn.row_factory = sqlite3.Row
-    return conn
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+    conn.execute('PRAGMA query_only = ON')
+    return conn, database_id()
+
+def get_db_connection():
+    """Check a connection out of the pool for the rest of the request.
+    release_db_connection() returns it when the request ends."""
+    if 'db' not in g:
+        current = database_id()
+        while True:
+            try:
+                conn, db_id = _pool.get_nowait()
+            except queue.Empty:
+                g.db = open_db_connection()
+                break
+            if db_id == current:
+                g.db = (conn, db_id)
+                break
+            conn.close()  # opened on a database file that has since been replaced
+    return g.db[0]
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    """Return the request's connection to the pool, or close it if the pool is full
+    or the request failed on it"""
+    checked_out = g.pop('db', None)
+    if checked_out is None:
+        return
+    conn, _db_id = checked_out
+    if isinstance(exception, sqlite3.Error):
+        conn.close()
+        return
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _pool.put_nowait(checked_out)
+    except queue.Full:
+        conn.close()
+
+# Responses of the plot endpoints are cached until the database changes
+RESPONSE_CACHE_SIZE = 256
+
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+def database_version():
+    """Changes whenever the database is written or a rebuild is published over it.
+    The -wal file is included so that commits not yet checkpointed count too."""
+    version = []
+    for path in (DB_PATH, DB_PATH + '-wal'):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        version.append((st.st_ino, st.st_size, st.st_mtime_ns))
+    return tuple(version)
+
+def cached_response(view):
+    """Serve a view from an LRU cache keyed by path, query string and database_version(),
+    with a strong ETag so that clients can revalidate with If-None-Match (304)"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.full_path
+        version = database_version()
+        with _response_cache_lock:
+            entry = _response_cache.get(key)
+            if entry is not None and entry[0] == version:
+                _response_cache.move_to_end(key)
+            else:
+                entry = None
+        if entry is None:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            entry = (version, hashlib.sha1(body).hexdigest(), body, response.mimetype)
+            with _response_cache_lock:
+                _response_cache[key] = entry
+                _response_cache.move_to_end(key)
+                while len(_response_cache) > RESPONSE_CACHE_SIZE:
+                    _response_cache.popitem(last=False)
+        _version, etag, body, mimetype = entry
+        response = app.response_class(body, mimetype=mimetype)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return wrapper
+
+def figure_response(figure):
+    """JSON response of a figure dict from figure_json"""
+    return app.response_class(figure_json(figure), mimetype='application/json')
 
 @app.route('/')
 def index():
@@ -27,168 +158,281 @@ def reasoning():
     """Reasoning analysis page with state selector"""
     return render_template('reasoning.html')
 
+def stats_summary(total, by_state, by_year):
+    return {
+        'total': total,
+        'by_state': [dict(row) for row in by_state],
+        'by_year': [dict(row) for row in by_year]
+    }
+
 @app.route('/api/stats')
+@cached_response
 def get_stats():
     """Get basic statistics"""
     conn = get_db_connection()
     
     # Total petitions
-    total = conn.execute('SELECT COUNT(*) as count FROM Petitions').fetchone()['count']
+    total = conn.execute(f'SELECT COALESCE(SUM(petition_count), 0) as count FROM Agg_Petition_Cube WHERE {PETITION_TOTALS}').fetchone()['count']
     
     # Petitions by state
-    by_state = conn.execute('''
-        SELECT state, COUNT(*) as count 
-        FROM Petitions 
+    by_state = conn.execute(f'''
+        SELECT state, SUM(petition_count) as count 
+        FROM Agg_Petition_Cube 
+        WHERE {PETITION_TOTALS}
         GROUP BY state
-        ORDER BY count DESC
+        ORDER BY count DESC, state
     ''').fetchall()
     
     # Petitions by year
-    by_year = conn.execute('''
-        SELECT year, COUNT(*) as count 
-        FROM Petitions 
-        WHERE year IS NOT NULL AND year != ''
+    by_year = conn.execute(f'''
+        SELECT year, SUM(petition_count) as count 
+        FROM Agg_Petition_Cube 
+        WHERE {PETITION_TOTALS} AND year != 0
         GROUP BY year
         ORDER BY year
     ''').fetchall()
     
-    conn.close()
-    
-    return jsonify({
-        'total': total,
-        'by_state': [dict(row) for row in by_state],
-        'by_year': [dict(row) for row in by_year]
-    })
+    return jsonify(stats_summary(total, by_state, by_year))
 
 @app.route('/plot/petitions_by_state')
+@cached_response
 def plot_petitions_by_state():
     """Generate a bar chart of petitions by state"""
     conn = get_db_connection()
     
-    df = pd.read_sql_query('''
-        SELECT state, COUNT(*) as count 
-        FROM Petitions 
-        WHERE state IS NOT NULL AND state != ''
+    df = pd.read_sql_query(f'''
+        SELECT state, SUM(petition_count) as count 
+        FROM Agg_Petition_Cube 
+        WHERE {PETITION_TOTALS} AND state != ''
         GROUP BY state
-        ORDER BY count DESC
+        ORDER BY count DESC, state
     ''', conn)
-    
-    conn.close()
-    
-    fig = px.bar(df, x='state', y='count', 
-                 title='Divorce Petitions by State',
-                 labels={'state': 'State', 'count': 'Number of Petitions'},
-                 color='count',
-                 color_continuous_scale='Blues')
-    
-    fig.update_layout(
-        xaxis_tickangle=-45,
-        height=500,
-        template='plotly_white'
-    )
-    
-    graphJSON = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-    return graphJSON
+
+    return figure_response(petitions_by_state_figure(df))
+
+def petitions_by_state_figure(df):
+    """Bar chart of a state, count DataFrame"""
+    return bar_figure(df['state'].tolist(), df['count'].tolist(),
+                      title='Divorce Petitions by State',
+                      x_label='State', y_label='Number of Petitions',
+                      colorscale='Blues', height=500, tickangle=-45)
 
 @app.route('/plot/petitions_by_year')
+@cached_response
 def plot_petitions_by_year():
     """Generate a line chart of petitions over time"""
     conn = get_db_connection()
     
-    df = pd.read_sql_query('''
-        SELECT year, COUNT(*) as count 
-        FROM Petitions 
-        WHERE year IS NOT NULL AND year != ''
+    df = pd.read_sql_query(f'''
+        SELECT year, SUM(petition_count) as count 
+        FROM Agg_Petition_Cube 
+        WHERE {PETITION_TOTALS} AND year != 0
         GROUP BY year
         ORDER BY year
     ''', conn)
-    
-    conn.close()
-    
-    fig = px.line(df, x='year', y='count', 
-                  title='Divorce Petitions Over Time',
-                  labels={'year': 'Year', 'count': 'Number of Petitions'},
-                  markers=True)
-    
-    fig.update_layout(
-        height=500,
-        template='plotly_white'
-    )
-    
-    graphJSON = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-    return graphJSON
+
+    return figure_response(petitions_by_year_figure(df))
+
+def petitions_by_year_figure(df):
+    """Line chart of a year, count DataFrame"""
+    return line_figure(df['year'].tolist(), df['count'].tolist(),
+                       title='Divorce Petitions Over Time',
+                       x_label='Year', y_label='Number of Petitions', height=500)
 
 @app.route('/plot/petitions_by_result')
+@cached_response
 def plot_petitions_by_result():
     """Generate a pie chart of petition results"""
     conn = get_db_connection()
     
     df = pd.read_sql_query('''
-        SELECT result, COUNT(*) as count 
-        FROM Petitions 
-        WHERE result IS NOT NULL AND result != ''
+        SELECT result, SUM(petition_count) as count 
+        FROM Agg_Petition_Cube 
+        WHERE reasoning_id = 0 AND result NOT IN ('*', '')
         GROUP BY result
-        ORDER BY count DESC
+        ORDER BY count DESC, result
     ''', conn)
-    
-    conn.close()
-    
-    fig = px.pie(df, values='count', names='result', 
-                 title='Petition Results Distribution',
-                 hole=0.3)
-    
-    fig.update_layout(
-        height=500,
-        template='plotly_white'
-    )
-    
-    graphJSON = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-    return graphJSON
+
+    return figure_response(petitions_by_result_figure(df))
+
+def petitions_by_result_figure(df):
+    """Pie chart of a result, count DataFrame"""
+    return pie_figure(df['result'].tolist(), df['count'].tolist(),
+                      title='Petition Results Distribution', height=500, hole=0.3,
+                      hovertemplate='result=%{label}<br>count=%{value}<extra></extra>')
 
 @app.route('/plot/petitions_by_county')
+@cached_response
 def plot_petitions_by_county():
     """Generate a bar chart of top counties by petition count"""
     conn = get_db_connection()
     
-    df = pd.read_sql_query('''
-        SELECT county, state, COUNT(*) as count 
-        FROM Petitions 
-        WHERE county IS NOT NULL AND county != ''
+    df = pd.read_sql_query(f'''
+        SELECT county, state, SUM(petition_count) as count 
+        FROM Agg_Petition_Cube 
+        WHERE {PETITION_TOTALS} AND county != ''
         GROUP BY county, state
-        ORDER BY count DESC
+        ORDER BY count DESC, county, state
         LIMIT 20
     ''', conn)
-    
-    conn.close()
-    
+
+    return figure_response(petitions_by_county_figure(df))
+
+def petitions_by_county_figure(df):
+    """Bar chart of a county, state, count DataFrame (the top counties)"""
     # Combine county and state for better labels
-    df['location'] = df['county'] + ', ' + df['state']
-    
-    fig = px.bar(df, x='location', y='count', 
-                 title='Top 20 Counties by Petition Count',
-                 labels={'location': 'County, State', 'count': 'Number of Petitions'},
-                 color='count',
-                 color_continuous_scale='Viridis')
-    
-    fig.update_layout(
-        xaxis_tickangle=-45,
-        height=600,
-        template='plotly_white'
-    )
-    
-    graphJSON = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-    return graphJSON
+    locations = (df['county'] + ', ' + df['state']).tolist()
+    return bar_figure(locations, df['count'].tolist(),
+                      title='Top 20 Counties by Petition Count',
+                      x_label='County, State', y_label='Number of Petitions',
+                      colorscale='Viridis', height=600, tickangle=-45)
+
+def petition_filters(conn, args):
+    """WHERE fragments and parameters for the /data/petitions filters.
+    Repeated result and reasoning parameters match any of their values."""
+    clauses, params = [], []
+    for name, column in (('state', 'p.state'), ('county', 'p.county')):
+        if args.get(name):
+            clauses.append(f'{column} = ?')
+            params.append(args[name])
+    year_from = args.get('year_from', type=int)
+    year_to = args.get('year_to', type=int)
+    if year_from is not None:
+        clauses.append('p.year_int >= ?')
+        params.append(year_from)
+    if year_to is not None:
+        clauses.append('p.year_int <= ?')
+        params.append(year_to)
+    if args.get('court'):
+        clauses.append('p.court_id IN (SELECT court_id FROM Court WHERE court_name = ?)')
+        params.append(args['court'])
+    results = args.getlist('result')
+    if results:
+        clauses.append(f'''EXISTS (SELECT 1 FROM Result WHERE petition_id = p.petition_id
+            AND result IN ({", ".join("?" * len(results))}))''')
+        params.extend(results)
+    reasons = args.getlist('reasoning')
+    if reasons:
+        ids = petition_reasoning_ids(conn, reasons)
+        clauses.append(f'''EXISTS (SELECT 1 FROM Petition_Reasoning_Lookup WHERE petition_id = p.petition_id
+            AND reasoning_id IN ({", ".join("?" * len(ids))}))''')
+        params.extend(ids)
+    return clauses, params
+
+def petition_reasoning_ids(conn, reasons):
+    """reasoning_ids for raw terms ('adultery(M)') or stored names ('adultery', any party)"""
+    known = load_reasoning_ids(conn)
+    ids = set()
+    for reason in reasons:
+        term = normalize_term(reason)[0]
+        if term in known:
+            ids.add(known[term])
+        else:
+            ids.update(row[0] for row in conn.execute(
+                'SELECT reasoning_id FROM Reasoning WHERE reasoning = ?', (reason.strip(),)))
+    return sorted(ids)
+
+def petition_page(conn, clauses, params, after, limit):
+    """One keyset page: the petitions after petition_id `after` that match, with the
+    court name and their reasons and results as lists"""
+    where = ' AND '.join(['p.petition_id > ?'] + clauses)
+    cursor = conn.execute(f'''
+        SELECT p.*, c.court_name,
+               (SELECT json_group_array(json_array(r.reasoning, r.party_accused))
+                FROM Petition_Reasoning_Lookup prl JOIN Reasoning r ON r.reasoning_id = prl.reasoning_id
+                WHERE prl.petition_id = p.petition_id) AS reasons,
+               (SELECT json_group_array(result) FROM Result WHERE petition_id = p.petition_id) AS results
+        FROM Petitions p
+        LEFT JOIN Court c ON c.court_id = p.court_id
+        WHERE {where}
+        ORDER BY p.petition_id
+        LIMIT ?
+    ''', [after] + params + [limit])
+    columns = [d[0] for d in cursor.description]
+    rows = []
+    for row in cursor:
+        petition = dict(zip(columns, row))
+        petition['reasons'] = [stored_term(reasoning, party) for reasoning, party in json.loads(petition['reasons'])]
+        petition['results'] = json.loads(petition['results'])
+        rows.append(petition)
+    return columns, rows
+
+def petition_stream(conn, clauses, params, after, fmt):
+    """Every matching petition after `after` as NDJSON or CSV lines, read one keyset
+    page at a time so that memory stays flat however many rows match"""
+    header_written = False
+    while True:
+        columns, rows = petition_page(conn, clauses, params, after, PETITIONS_STREAM_BATCH)
+        if fmt == 'csv':
+            out = io.StringIO()
+            writer = csv.writer(out)
+            if not header_written:
+                writer.writerow(columns)
+                header_written = True
+            for petition in rows:
+                petition['reasons'] = '; '.join(petition['reasons'])
+                petition['results'] = '; '.join(r for r in petition['results'] if r is not None)
+                writer.writerow(petition[column] for column in columns)
+            yield out.getvalue()
+        else:
+            yield ''.join(dumps(petition) + '\n' for petition in rows)
+        if len(rows) < PETITIONS_STREAM_BATCH:
+            return
+        after = rows[-1]['petition_id']
 
 @app.route('/data/petitions')
 def get_petitions():
-    """Get all petitions data"""
+    """Petitions with their court, reasons and results, oldest petition_id first.
+
+    Filters: state, county, year_from, year_to, court (name), result and reasoning
+    (both repeatable). Pages are keyset cursors: pass the returned next_after as
+    after for the next page. format=ndjson or format=csv streams every matching
+    petition after `after` instead of one page.
+    """
+    fmt = request.args.get('format', 'json')
+    if fmt not in ('json', 'ndjson', 'csv'):
+        return jsonify({'error': 'format must be json, ndjson or csv'}), 400
+    after = request.args.get('after', 0, type=int)
+    conn = get_db_connection()
+    clauses, params = petition_filters(conn, request.args)
+
+    if fmt != 'json':
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        response = app.response_class(stream_with_context(petition_stream(conn, clauses, params, after, fmt)),
+                                      mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename=petitions.{fmt}'
+        return response
+
+    limit = min(max(request.args.get('limit', PETITIONS_PAGE_SIZE, type=int), 1), PETITIONS_MAX_PAGE_SIZE)
+    _columns, rows = petition_page(conn, clauses, params, after, limit)
+    return jsonify({
+        'petitions': rows,
+        'next_after': rows[-1]['petition_id'] if len(rows) == limit else None
+    })
+
+@app.route('/api/search')
+def search_petitions():
+    """Full-text search over parcel numbers, archives, names, reasons and requests.
+    Query parameters: q (required), page (from 1) and per_page."""
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'missing query parameter q'}), 400
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', SEARCH_PAGE_SIZE, type=int), 1), SEARCH_MAX_PAGE_SIZE)
+    
     conn = get_db_connection()
-    petitions = conn.execute('SELECT * FROM Petitions LIMIT 100').fetchall()
-    conn.close()
+    total, rows = search(conn, q, limit=per_page, offset=(page - 1) * per_page)
     
-    return jsonify([dict(row) for row in petitions])
+    return jsonify({
+        'query': q,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'results': [dict(row) for row in rows]
+    })
 
 @app.route('/plot/reasoning_by_state/<state>')
+@cached_response
 def plot_reasoning_by_state(state):
     """Generate a pie chart of top 3 reasoning for a specific state"""
     conn = get_db_connection()
@@ -196,44 +440,32 @@ def plot_reasoning_by_state(state):
     query = '''
     SELECT 
         r.reasoning,
-        COUNT(*) as reasoning_count
-    FROM Reasoning r
-    JOIN Petition_Reasoning_Lookup prl ON r.reasoning_id = prl.reasoning_id
-    JOIN Petitions p ON prl.petition_id = p.petition_id
-    WHERE p.state = ?
+        SUM(c.petition_count) as reasoning_count
+    FROM Agg_Petition_Cube c
+    JOIN Reasoning r ON r.reasoning_id = c.reasoning_id
+    WHERE c.state = ? AND c.result = '*'
     GROUP BY r.reasoning
     ORDER BY reasoning_count DESC
     LIMIT 3
     '''
     
     df = pd.read_sql_query(query, conn, params=(state,))
-    conn.close()
     
     if df.empty:
         # Return empty chart if no data
-        fig = px.pie(values=[1], names=['No Data'], title=f'Top 3 Divorce Reasons in {state}')
+        fig = pie_figure(['No Data'], [1], title=f'Top 3 Divorce Reasons in {state}')
     else:
         # Create pull array - pull out the top reason (first slice)
         pull_values = [0.2] + [0] * (len(df) - 1)
-        
-        fig = go.Figure(data=[go.Pie(
-            labels=df['reasoning'].tolist(),
-            values=df['reasoning_count'].tolist(),
-            pull=pull_values
-        )])
-        
-        fig.update_traces(textposition='inside', textinfo='percent+label')
-        fig.update_layout(title=f'Top 3 Divorce Reasons in {state}')
-        fig.update_layout(
-            height=500,
-            template='plotly_white',
-            showlegend=True
-        )
-    
-    graphJSON = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-    return graphJSON
+
+        fig = pie_figure(df['reasoning'].tolist(), df['reasoning_count'].tolist(),
+                         title=f'Top 3 Divorce Reasons in {state}', height=500,
+                         pull=pull_values, textinfo='percent+label')
+
+    return figure_response(fig)
 
 @app.route('/plot/reasoning_all_states')
+@cached_response
 def plot_reasoning_all_states():
     """Generate a pie chart showing all reasoning across all states"""
     conn = get_db_connection()
@@ -241,17 +473,20 @@ def plot_reasoning_all_states():
     query = '''
     SELECT 
         r.reasoning,
-        COUNT(*) as reasoning_count
-    FROM Reasoning r
-    JOIN Petition_Reasoning_Lookup prl ON r.reasoning_id = prl.reasoning_id
-    JOIN Petitions p ON prl.petition_id = p.petition_id
+        SUM(c.petition_count) as reasoning_count
+    FROM Agg_Petition_Cube c
+    JOIN Reasoning r ON r.reasoning_id = c.reasoning_id
+    WHERE c.result = '*'
     GROUP BY r.reasoning
     ORDER BY reasoning_count DESC
     '''
     
     df = pd.read_sql_query(query, conn)
-    conn.close()
-    
+
+    return figure_response(reasoning_all_states_figure(df))
+
+def reasoning_all_states_figure(df):
+    """Pie chart of a reasoning, reasoning_count DataFrame, small reasons grouped as Other"""
     # Group smaller reasons into "Other" category
     # Keep top reasons, combine rest as "Other"
     threshold = df['reasoning_count'].sum() * 0.03  # Less than 3% goes to "Other"
@@ -264,22 +499,63 @@ def plot_reasoning_all_states():
     # Create pull array - pull out the top reason (most common)
     pull_values = [0.2] + [0] * (len(df) - 1)
     
-    fig = go.Figure(data=[go.Pie(
-        labels=df['reasoning'].tolist(),
-        values=df['reasoning_count'].tolist(),
-        pull=pull_values
-    )])
-    
-    fig.update_traces(textposition='inside', textinfo='percent+label')
-    fig.update_layout(
-        title='Distribution of Divorce Reasons Across All States',
-        height=600,
-        template='plotly_white',
-        showlegend=True
-    )
-    
-    graphJSON = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-    return graphJSON
+    return pie_figure(df['reasoning'].tolist(), df['reasoning_count'].tolist(),
+                      title='Distribution of Divorce Reasons Across All States', height=600,
+                      pull=pull_values, textinfo='percent+label')
+
+@app.route('/api/dashboard')
+@cached_response
+def get_dashboard():
+    """Statistics and every dashboard figure in one response, from a single grouped
+    pass over Agg_Petition_Cube folded in pandas"""
+    conn = get_db_connection()
+
+    # Petition totals and results (reasoning_id 0) and reasoning totals (result '*')
+    # are slices of the cube, so one scan covers every figure. Only the totals slice
+    # keeps county and year, which keeps the grouped result small.
+    cube = pd.read_sql_query('''
+        SELECT c.*, r.reasoning
+        FROM (
+            SELECT state,
+                   CASE WHEN reasoning_id = 0 AND result = '*' THEN county ELSE '' END AS county,
+                   CASE WHEN reasoning_id = 0 AND result = '*' THEN year ELSE 0 END AS year,
+                   reasoning_id, result, SUM(petition_count) as count
+            FROM Agg_Petition_Cube
+            WHERE reasoning_id = 0 OR result = '*'
+            GROUP BY 1, 2, 3, 4, 5
+        ) c
+        LEFT JOIN Reasoning r ON r.reasoning_id = c.reasoning_id
+    ''', conn)
+
+    totals = cube[(cube['reasoning_id'] == 0) & (cube['result'] == '*')]
+    by_state = (totals.groupby('state', as_index=False)['count'].sum()
+                .sort_values(['count', 'state'], ascending=[False, True]))
+    by_year = totals[totals['year'] != 0].groupby('year', as_index=False)['count'].sum()
+    by_county = (totals[totals['county'] != '']
+                 .groupby(['county', 'state'], as_index=False)['count'].sum()
+                 .sort_values(['count', 'county', 'state'], ascending=[False, True, True])
+                 .head(20).reset_index(drop=True))
+    results = cube[(cube['reasoning_id'] == 0) & ~cube['result'].isin(['*', ''])]
+    by_result = (results.groupby('result', as_index=False)['count'].sum()
+                 .sort_values(['count', 'result'], ascending=[False, True]))
+    reasons = cube[(cube['reasoning_id'] != 0) & (cube['result'] == '*')]
+    by_reasoning = (reasons.groupby('reasoning', as_index=False)['count'].sum()
+                    .rename(columns={'count': 'reasoning_count'})
+                    .sort_values('reasoning_count', ascending=False))
+
+    stats = stats_summary(int(totals['count'].sum()),
+                          by_state.astype(object).to_dict('records'),
+                          by_year.astype(object).to_dict('records'))
+    figures = {
+        'petitions_by_state': petitions_by_state_figure(by_state[by_state['state'] != '']),
+        'petitions_by_year': petitions_by_year_figure(by_year),
+        'petitions_by_result': petitions_by_result_figure(by_result),
+        'petitions_by_county': petitions_by_county_figure(by_county),
+        'reasoning_all_states': reasoning_all_states_figure(by_reasoning),
+    }
+    body = ','.join(f'{dumps(name)}:{figure_json(fig)}' for name, fig in figures.items())
+    return app.response_class(f'{{"stats":{dumps(stats)},"figures":{{{body}}}}}', mimetype='application/json')
 
 if __name__ == '__main__':
+    # Development server with the debugger and reloader; serve asgi.py in production
     app.run(debug=True, port=5000)
@@ -0,0 +1,24 @@
+"""
+ASGI entry point: the dashboard API served by uvicorn instead of the Flask debug server.
+
+The Flask routes are unchanged. a2wsgi runs each request on a bounded thread pool
+(THREADS threads per worker process) while uvicorn's event loop keeps accepting
+connections, so requests from several clients are handled concurrently instead of
+queueing. SQLite releases the GIL while a query runs, and each thread checks a
+connection out of the app's read-only pool, which holds as many connections as
+there are threads. For CPU-bound routes (building figures), add worker processes:
+
+    cd flask_app
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+
+Each worker process has its own connection pool and response cache.
+"""
+
+from a2wsgi import WSGIMiddleware
+
+from app import POOL_SIZE, app
+
+# One thread per pooled connection, so a request never waits for a connection
+THREADS = POOL_SIZE
+
+application = WSGIMiddleware(app, workers=THREADS)
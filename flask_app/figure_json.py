@@ -0,0 +1,128 @@
+"""
+Minimal Plotly figure JSON for the chart routes.
+
+Building a figure with plotly.express and encoding it with PlotlyJSONEncoder
+validates every property and walks the whole figure, including all of the template,
+in pure Python. The functions here build the figure dicts directly from the query
+results instead: only the properties the charts set, with plain lists rather than
+numpy typed arrays. The template is serialized once at import, trimmed to the
+layout keys and trace types the charts use, and spliced into the output. The JSON
+is encoded with orjson when it is installed.
+
+The charts look the same as the plotly.express versions. Compare the two with
+scripts/benchmark_figure_json.py.
+"""
+
+import json
+from functools import lru_cache
+
+import plotly.express as px
+import plotly.io as pio
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TEMPLATE = 'plotly_white'
+# Template layout keys that apply to 2D cartesian charts and pies
+TEMPLATE_LAYOUT_KEYS = ['autotypenumbers', 'colorway', 'font', 'hovermode', 'hoverlabel', 'paper_bgcolor',
+                        'plot_bgcolor', 'coloraxis', 'xaxis', 'yaxis', 'title', 'shapedefaults',
+                        'annotationdefaults']
+
+
+def dumps(obj):
+    """Compact JSON text of obj"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, separators=(',', ':'))
+
+
+@lru_cache(maxsize=None)
+def template_json(trace_types):
+    """Serialized template with the defaults of trace_types only (a sorted tuple)"""
+    template = pio.templates[TEMPLATE].to_plotly_json()
+    return dumps({
+        'data': {t: template['data'][t] for t in trace_types if t in template['data']},
+        'layout': {k: template['layout'][k] for k in TEMPLATE_LAYOUT_KEYS if k in template['layout']},
+    })
+
+
+def figure_json(figure):
+    """JSON text of a figure dict from the functions below, with the template spliced in"""
+    trace_types = tuple(sorted({trace['type'] for trace in figure['data']}))
+    layout = dumps(figure['layout'])
+    return (f'{{"data":{dumps(figure["data"])},'
+            f'"layout":{layout[:-1]},"template":{template_json(trace_types)}}}}}')
+
+
+def continuous_colorscale(name):
+    """[[position, color], ...] of a plotly.express sequential color scale"""
+    colors = getattr(px.colors.sequential, name)
+    return [[i / (len(colors) - 1), color] for i, color in enumerate(colors)]
+
+
+def bar_figure(x, y, title, x_label, y_label, colorscale, height, tickangle=None):
+    """Bar chart with the bars colored by value, as px.bar(..., color=y)"""
+    xaxis = {'title': {'text': x_label}}
+    if tickangle is not None:
+        xaxis['tickangle'] = tickangle
+    return {
+        'data': [{
+            'type': 'bar',
+            'x': list(x),
+            'y': list(y),
+            'marker': {'color': list(y), 'coloraxis': 'coloraxis'},
+            'hovertemplate': f'{x_label}=%{{x}}<br>{y_label}=%{{marker.color}}<extra></extra>',
+            'name': '',
+            'showlegend': False,
+        }],
+        'layout': {
+            'title': {'text': title},
+            'xaxis': xaxis,
+            'yaxis': {'title': {'text': y_label}},
+            'coloraxis': {'colorbar': {'title': {'text': y_label}},
+                          'colorscale': continuous_colorscale(colorscale)},
+            'barmode': 'relative',
+            'height': height,
+        },
+    }
+
+
+def line_figure(x, y, title, x_label, y_label, height):
+    """Line chart with markers, as px.line(..., markers=True)"""
+    return {
+        'data': [{
+            'type': 'scatter',
+            'mode': 'lines+markers',
+            'x': list(x),
+            'y': list(y),
+            'hovertemplate': f'{x_label}=%{{x}}<br>{y_label}=%{{y}}<extra></extra>',
+            'name': '',
+            'showlegend': False,
+        }],
+        'layout': {
+            'title': {'text': title},
+            'xaxis': {'title': {'text': x_label}},
+            'yaxis': {'title': {'text': y_label}},
+            'height': height,
+        },
+    }
+
+
+def pie_figure(labels, values, title, height=None, hole=None, pull=None, textinfo=None, hovertemplate=None):
+    """Pie chart; pull offsets slices and textinfo puts that text inside the slices"""
+    trace = {'type': 'pie', 'labels': list(labels), 'values': list(values)}
+    if hole is not None:
+        trace['hole'] = hole
+    if pull is not None:
+        trace['pull'] = list(pull)
+    if textinfo is not None:
+        trace['textinfo'] = textinfo
+        trace['textposition'] = 'inside'
+    if hovertemplate is not None:
+        trace['hovertemplate'] = hovertemplate
+    layout = {'title': {'text': title}, 'showlegend': True}
+    if height is not None:
+        layout['height'] = height
+    return {'data': [trace], 'layout': layout}
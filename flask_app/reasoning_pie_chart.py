@@ -4,15 +4,28 @@ Based on queries4.py data - Shows distribution of divorce reasons across all sta
 
 This script creates a pie chart similar to the Plotly template example.
 It groups smaller reasons into "Other" category for better visualization.
+
+Counts come from the Parquet export of the petitions when there is one (python
+petition_export.py, or database.db.py --export). Without an export, i.e. when
+dv_petitions_parquet/_manifest.json is missing, it falls back to counting with SQL
+against dv_petitions.db; no export is written.
 """
 
+import os
 import sqlite3
+import sys
+
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
-# Database path
-db_path = '../dv_petitions.db.bak'
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT_DIR)
+from petition_export import MANIFEST, load_petitions
+
+# Parquet export of the petitions (python petition_export.py, or database.db.py --export)
+export_dir = os.path.join(ROOT_DIR, 'dv_petitions_parquet')
+db_path = os.path.join(ROOT_DIR, 'dv_petitions.db')
 
 # Query to get all reasoning counts across all states
 query = '''
@@ -26,10 +39,17 @@ GROUP BY r.reasoning
 ORDER BY reasoning_count DESC
 '''
 
-# Connect and fetch data
-conn = sqlite3.connect(db_path)
-df = pd.read_sql_query(query, conn)
-conn.close()
+if os.path.exists(os.path.join(export_dir, MANIFEST)):
+    # Count every reason cited across all states: one row per petition, so explode the
+    # reasons list column instead of joining Reasoning, Petition_Reasoning_Lookup and Petitions
+    petitions = load_petitions(export_dir, columns=['reasons'])
+    df = (petitions['reasons'].explode().dropna()
+          .value_counts().rename_axis('reasoning').reset_index(name='reasoning_count'))
+else:
+    # No export yet: connect and fetch data
+    conn = sqlite3.connect(db_path)
+    df = pd.read_sql_query(query, conn)
+    conn.close()
 
 # Group smaller reasons into "Other" category (similar to the template example)
 # Reasons with less than 3% of total will be grouped as "Other"
@@ -1,5 +1,5 @@
 #!/bin/bash
-# Run the Flask app
+# Run the Flask app with uvicorn (see asgi.py); WORKERS sets the number of processes
 
 cd "$(dirname "$0")"
-./venv/bin/python3 app.py
+./venv/bin/uvicorn asgi:application --host 127.0.0.1 --port 5000 --workers "${WORKERS:-2}"
@@ -3,6 +3,8 @@ import time
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut
 
+import build_stats
+
 DB_PATH = 'dv_petitions.db'
 
 def get_county_location(county, state):
@@ -35,8 +37,9 @@ def get_county_location(county, state):
         print(f"Error geocoding {county}, {state}: {e}")
         return None
 
-def main():
-    conn = sqlite3.connect(DB_PATH)
+def geocode_missing(stage):
+    """Geocode every county in Petitions that has no Geolocations row yet"""
+    conn = build_stats.watch(sqlite3.connect(DB_PATH))
     cur = conn.cursor()
     
     # Get all unique county-state combinations
@@ -47,6 +50,7 @@ def main():
         ORDER BY state, county
     """)
     locations = cur.fetchall()
+    stage['rows'] = len(locations)
     
     for county, state in locations:
         # Check if we already have this location
@@ -78,7 +82,12 @@ def main():
         time.sleep(1)
     
     conn.close()
+
+def main():
+    with build_stats.stage('geocode') as stage:
+        geocode_missing(stage)
     print("Geocoding complete!")
 
 if __name__ == "__main__":
+    build_stats.configure()
     main()
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+Versioned migrations for dv_petitions.db.
+
+Each migration is a function that takes an open connection and does not commit. The
+runner records every applied migration in schema_migrations (id, checksum, applied_at,
+duration). Migrations that are already recorded are skipped; pending ones run in
+order, each inside its own transaction together with its ledger row. The checksum is
+a hash of the migration's source and of the modules that implement it. If it differs
+from the recorded one, the change is reported but the migration is not re-run.
+
+Most migrations rewrite data produced by the ETL (multi-name People rows, court
+names, request lists). A build that changes petitions calls forget_data_migrations()
+so they run again on the new rows. Schema-only migrations such as the analytic
+indexes, the petition cube and the search index are also applied by every build, which
+records them with record_build_migrations() so the runner does not build them twice.
+"""
+
+import argparse
+import datetime
+import hashlib
+import inspect
+import os
+import sqlite3
+import sys
+import time
+
+import build_stats
+from analytic_indexes import index_petitions
+from people_migration import split_people
+from petition_cube import build_cube
+from petition_search import build_search
+from reasoning_bitmap import build_bitmaps
+from people_resolution import resolve_people_clusters
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_script(subdir, name):
+    """Import a helper script from scripts/ or queries/ as a module"""
+    path = os.path.join(ROOT_DIR, subdir)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    return __import__(name)
+
+
+def split_people_rows(conn):
+    """Give each name in a multi-name People row its own row"""
+    split_people(conn)
+
+
+def resolve_people(conn):
+    """Person_Cluster: group spelling variants of a person (people_resolution.py)"""
+    resolve_people_clusters(conn)
+
+
+def create_court_table(conn):
+    """Court dimension and Petitions.court_id (scripts/create_court_table.py)"""
+    courts = import_script('scripts', 'create_court_table')
+    courts.create_court_table(conn)
+    courts.populate_court_table(conn)
+    courts.add_court_id_to_petitions(conn)
+
+
+def split_additional_requests(conn):
+    """Additional_Requests_Split: one row per request (queries/split_additional_requests.py)"""
+    import_script('queries', 'split_additional_requests').split_additional_requests(conn)
+
+
+def typed_dates_and_indexes(conn):
+    """Petitions.year_int/month_int and the covering indexes (analytic_indexes.py)"""
+    index_petitions(conn)
+
+
+def petition_cube(conn):
+    """Agg_Petition_Cube and the triggers that maintain it (petition_cube.py)"""
+    build_cube(conn)
+
+
+def petition_search(conn):
+    """Petition_Search full-text index and its triggers (petition_search.py)"""
+    build_search(conn)
+
+
+def reasoning_bitmap(conn):
+    """Petition_Reasoning_Bitmap and the triggers that invalidate it (reasoning_bitmap.py)"""
+    build_bitmaps(conn)
+
+
+# (id, function, reruns when petitions change), in the order they are applied
+MIGRATIONS = [
+    ('0001_split_people_rows', split_people_rows, True),
+    ('0002_create_court_table', create_court_table, True),
+    ('0003_split_additional_requests', split_additional_requests, True),
+    ('0004_resolve_people', resolve_people, True),
+    ('0005_typed_dates_and_indexes', typed_dates_and_indexes, False),
+    ('0006_petition_cube', petition_cube, False),
+    ('0007_petition_search', petition_search, False),
+    ('0008_reasoning_bitmap', reasoning_bitmap, False),
+]
+
+
+# Modules (relative to ROOT_DIR) that do each migration's work. Their source goes into
+# the checksum with the wrapper's, so a change to the logic is reported, not just one to
+# the wrapper.
+MIGRATION_SOURCES = {
+    split_people_rows: ['people_migration.py'],
+    create_court_table: ['scripts/create_court_table.py'],
+    split_additional_requests: ['queries/split_additional_requests.py'],
+    resolve_people: ['people_resolution.py'],
+    typed_dates_and_indexes: ['analytic_indexes.py'],
+    petition_cube: ['petition_cube.py'],
+    petition_search: ['petition_search.py'],
+    reasoning_bitmap: ['reasoning_bitmap.py', 'reasoning_normalizer.py'],
+}
+
+
+def migration_checksum(func):
+    digest = hashlib.sha1(inspect.getsource(func).encode('utf-8'))
+    for path in MIGRATION_SOURCES.get(func, []):
+        with open(os.path.join(ROOT_DIR, path), 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+def create_ledger(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_migrations (
+        id TEXT PRIMARY KEY,
+        checksum TEXT NOT NULL,
+        applied_at TEXT NOT NULL,
+        duration REAL NOT NULL
+    )''')
+    conn.commit()
+
+
+def applied_migrations(conn):
+    """Return {id: checksum} for every migration recorded in schema_migrations"""
+    create_ledger(conn)
+    return dict(conn.execute('SELECT id, checksum FROM schema_migrations'))
+
+
+def pending_migrations(conn):
+    applied = applied_migrations(conn)
+    return [(mid, func) for mid, func, _data in MIGRATIONS if mid not in applied]
+
+
+def run_migrations(conn):
+    """Apply every pending migration in order; returns the ids that were applied"""
+    applied = applied_migrations(conn)
+    for mid, func, _data in MIGRATIONS:
+        if mid in applied and applied[mid] != migration_checksum(func):
+            print(f'Migration {mid} changed since it was applied; not re-running it')
+
+    pending = [(mid, func) for mid, func, _data in MIGRATIONS if mid not in applied]
+    if not pending:
+        print('Schema is up to date; no pending migrations')
+        return []
+
+    # Migrations rewrite rows that others still reference, and the pragma is a no-op
+    # inside a transaction, so it is set before each BEGIN
+    conn.execute('PRAGMA foreign_keys = OFF')
+    done = []
+    for mid, func in pending:
+        with build_stats.stage(f'migration {mid}'):
+            start = time.perf_counter()
+            conn.execute('BEGIN')
+            try:
+                func(conn)
+                duration = time.perf_counter() - start
+                conn.execute('INSERT INTO schema_migrations VALUES (?, ?, ?, ?)',
+                             (mid, migration_checksum(func),
+                              datetime.datetime.now().isoformat(timespec='seconds'), round(duration, 4)))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                print(f'Migration {mid} failed and was rolled back')
+                raise
+        print(f'Applied migration {mid} in {duration:.3f}s')
+        done.append(mid)
+    return done
+
+
+def record_build_migrations(conn):
+    """Record the schema-only migrations as applied, with their current checksums.
+
+    Every build creates the analytic indexes, cube, search index and bitmaps itself, so
+    the runner would only rebuild them. Rows already in the ledger are kept.
+    """
+    create_ledger(conn)
+    applied_at = datetime.datetime.now().isoformat(timespec='seconds')
+    conn.executemany('INSERT OR IGNORE INTO schema_migrations VALUES (?, ?, ?, 0)',
+                     [(mid, migration_checksum(func), applied_at) for mid, func, data in MIGRATIONS if not data])
+
+
+def forget_data_migrations(conn):
+    """Drop the ledger rows of migrations that rewrite ETL data, so the next run
+    applies them to rows a build just added or changed. The caller commits."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'schema_migrations'").fetchone():
+        conn.executemany('DELETE FROM schema_migrations WHERE id = ?',
+                         [(mid,) for mid, _func, data in MIGRATIONS if data])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply pending migrations to dv_petitions.db')
+    parser.add_argument('--db', default='dv_petitions.db', help='Database to migrate (default: %(default)s)')
+    parser.add_argument('--status', action='store_true', help='List migrations and whether they are applied, then exit')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if args.status:
+        create_ledger(conn)
+        applied = dict(conn.execute('SELECT id, applied_at FROM schema_migrations'))
+        for mid, _func, _data in MIGRATIONS:
+            print(f"{mid:<40} {applied.get(mid, 'pending')}")
+    else:
+        run_migrations(conn)
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
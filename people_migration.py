@@ -0,0 +1,92 @@
+"""
+Batched migration that splits multi-name People rows.
+
+Joint petitions are transcribed with several names in one People.name cell, e.g.
+'Jane Roe, Mary Roe' or 'Jane Roe & Mary Roe'. split_people() gives each name its own
+People row, reusing an existing row when the same (name, enslaver_status,
+enslaver_scope_estimate) is already present. The first name keeps the enslaver
+fields and later names get NULLs. Petition_People_Lookup links to a split row are
+moved to its parts, and the split row is deleted.
+
+People is read once into a dictionary index. New rows are written with one
+executemany, and links and deletes are rewritten with set-based statements through
+a TEMP mapping table, so the statement count does not depend on the size of the table.
+"""
+
+import re
+
+# Separators between names in one People.name cell
+NAME_SEPARATORS = re.compile(r"\s*(?:,|&| and |;)\s*")
+# Commas only, as used by scripts/split_people_rows_safe.py
+COMMA_SEPARATOR = re.compile(r"\s*,\s*")
+
+
+def split_name(name, splitter=NAME_SEPARATORS):
+    """Split one People.name cell into its stripped, non-empty names"""
+    return [part.strip() for part in splitter.split(name or '') if part.strip()]
+
+
+def split_people(conn, splitter=NAME_SEPARATORS):
+    """Split every multi-name People row on conn; the caller commits.
+
+    Returns (split_rows, created_rows): how many People rows were split and how many
+    new People rows were inserted for their names.
+    """
+    c = conn.cursor()
+    people = c.execute('SELECT person_id, name, enslaver_status, enslaver_scope_estimate FROM People').fetchall()
+    index = {(name, status, scope): person_id for person_id, name, status, scope in people}
+
+    # AUTOINCREMENT never reuses an id, so continue after the larger of the sequence and max(person_id)
+    seq = c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'People'").fetchone()
+    next_id = max(seq[0] if seq else 0, max((p[0] for p in people), default=0)) + 1
+
+    new_people = []  # (person_id, name, enslaver_status, enslaver_scope_estimate)
+    mapping = []  # (old_id, ord, new_id)
+    for person_id, name, status, scope in people:
+        parts = split_name(name, splitter)
+        if len(parts) <= 1:
+            continue
+        for i, part in enumerate(parts):
+            key = (part, status, scope) if i == 0 else (part, None, None)
+            new_id = index.get(key)
+            if new_id is None:
+                new_id = index[key] = next_id
+                next_id += 1
+                new_people.append((new_id,) + key)
+            mapping.append((person_id, i, new_id))
+
+    if not mapping:
+        return 0, 0
+
+    c.executemany('INSERT INTO People (person_id, name, enslaver_status, enslaver_scope_estimate) VALUES (?, ?, ?, ?)',
+                  new_people)
+    c.execute('CREATE TEMP TABLE Person_Split (old_id INTEGER, ord INTEGER, new_id INTEGER, PRIMARY KEY (old_id, ord))')
+    c.executemany('INSERT INTO Person_Split VALUES (?, ?, ?)', mapping)
+
+    # Links that already point at one of the target rows are not added twice. They are
+    # copied into an indexed TEMP table, since Petition_People_Lookup itself has no index.
+    c.execute('CREATE TEMP TABLE Existing_Links (petition_id INTEGER, person_id INTEGER, PRIMARY KEY (petition_id, person_id))')
+    c.execute('''
+    INSERT OR IGNORE INTO Existing_Links
+    SELECT petition_id, person_id FROM Petition_People_Lookup
+    WHERE person_id IN (SELECT new_id FROM Person_Split)
+    ''')
+    # Point each link to a split row at every one of its names
+    c.execute('''
+    INSERT INTO Petition_People_Lookup (petition_id, person_id)
+    SELECT l.petition_id, s.new_id
+    FROM Petition_People_Lookup l
+    JOIN Person_Split s ON s.old_id = l.person_id
+    WHERE NOT EXISTS (
+        SELECT 1 FROM Existing_Links e
+        WHERE e.petition_id = l.petition_id AND e.person_id = s.new_id
+    )
+    GROUP BY l.petition_id, s.new_id
+    ORDER BY MIN(l.rowid), MIN(s.ord)
+    ''')
+    c.execute('DELETE FROM Petition_People_Lookup WHERE person_id IN (SELECT old_id FROM Person_Split)')
+    c.execute('DELETE FROM People WHERE person_id IN (SELECT old_id FROM Person_Split)')
+    c.execute('DROP TABLE Person_Split')
+    c.execute('DROP TABLE Existing_Links')
+    split_rows = len({old_id for old_id, _ord, _new_id in mapping})
+    return split_rows, len(new_people)
@@ -0,0 +1,192 @@
+"""
+Entity resolution for People: group spelling variants of the same person.
+
+People rows are unique on exact (name, enslaver_status, enslaver_scope_estimate), so
+'Elizabeth Smith' and 'Elisabeth Smith' from two archives get separate person_ids.
+resolve_people_clusters() does not compare every pair of names. It first writes
+blocking keys for each person to the indexed Person_Blocking_Key table:
+
+- soundex: Soundex code of the surname plus the first initial
+- initial: normalized surname plus the first initial
+- ngram:   the NGRAM_KEYS smallest hashed character trigrams of the full name, joined
+
+Only people sharing a key are compared. A block with more than MAX_BLOCK people is
+split by a second key, the Soundex code of the first name; sub-blocks that are still
+too large are skipped and counted in the 'person_blocking' stage record, so the work
+grows roughly linearly with People. Matching pairs are merged with union-find,
+and Person_Cluster maps every person_id to a cluster_id, the smallest person_id in
+its cluster. People rows are left untouched; queries join through Person_Cluster
+to count distinct people.
+"""
+
+import re
+import zlib
+from difflib import SequenceMatcher
+
+import build_stats
+
+# Minimum SequenceMatcher ratio between first names and between surnames for a match
+MATCH_THRESHOLD = 0.8
+# Blocks larger than this are split by the first name's Soundex code; sub-blocks still
+# larger are too unspecific to be worth comparing pairwise
+MAX_BLOCK = 50
+NGRAM_KEYS = 3
+
+HONORIFICS = {'mr', 'mrs', 'miss', 'ms', 'dr', 'rev', 'jr', 'sr', 'esq'}
+NON_NAME = re.compile(r'[^a-z0-9 ]+')
+DIGITS = re.compile(r'\d+')
+SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(
+    ['aeiouyhw', 'bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r']) for c in letters}
+
+
+def normalize_name(name):
+    """Lowercase, drop punctuation and honorifics; returns the list of name tokens"""
+    tokens = NON_NAME.sub(' ', (name or '').lower()).split()
+    return [t for t in tokens if t not in HONORIFICS]
+
+
+def soundex(word):
+    letters = [c for c in word if c.isalpha()]
+    if not letters:
+        return ''
+    code = letters[0].upper()
+    last = SOUNDEX_CODES.get(letters[0])
+    for c in letters[1:]:
+        digit = SOUNDEX_CODES.get(c)
+        if digit != '0' and digit != last:
+            code += digit
+        # h and w do not separate letters with the same code; vowels do
+        if c not in 'hw':
+            last = digit
+    return (code + '000')[:4]
+
+
+def blocking_keys(tokens):
+    """Return the (key_type, key, subkey) triples for one normalized name. subkey splits
+    blocks larger than MAX_BLOCK."""
+    if not tokens:
+        return []
+    first, surname = tokens[0], tokens[-1]
+    subkey = soundex(first)
+    keys = [('soundex', soundex(surname) + first[0], subkey),
+            ('initial', f'{surname} {first[0]}', subkey)]
+    text = ' '.join(tokens)
+    grams = {zlib.crc32(text[i:i + 3].encode('utf-8')) for i in range(len(text) - 2)}
+    keys.append(('ngram', '.'.join(str(h) for h in sorted(grams)[:NGRAM_KEYS]), subkey))
+    return keys
+
+
+def candidate_pairs(c):
+    """Return (pairs, skipped_blocks, skipped_people): the person_id pairs sharing a block
+    of at most MAX_BLOCK people, splitting larger blocks by subkey, and the number of
+    (sub-)blocks left too large to compare and of people in them"""
+    c.execute('DROP TABLE IF EXISTS temp.Person_Block')
+    c.execute('''CREATE TEMP TABLE Person_Block AS
+        SELECT k.person_id, k.key_type,
+               CASE WHEN n.size > ? THEN k.key || ' ' || k.subkey ELSE k.key END AS block
+        FROM Person_Blocking_Key k
+        JOIN (SELECT key_type, key, COUNT(*) AS size FROM Person_Blocking_Key GROUP BY key_type, key) n
+          ON n.key_type = k.key_type AND n.key = k.key
+    ''', (MAX_BLOCK,))
+    c.execute('CREATE INDEX temp.idx_person_block ON Person_Block (key_type, block, person_id)')
+
+    # Candidate pairs: people sharing at least one block of manageable size
+    pairs = c.execute('''
+        SELECT DISTINCT a.person_id, b.person_id
+        FROM (
+            SELECT key_type, block FROM Person_Block
+            GROUP BY key_type, block
+            HAVING COUNT(*) BETWEEN 2 AND ?
+        ) blk
+        JOIN Person_Block a ON a.key_type = blk.key_type AND a.block = blk.block
+        JOIN Person_Block b ON b.key_type = blk.key_type AND b.block = blk.block AND b.person_id > a.person_id
+    ''', (MAX_BLOCK,)).fetchall()
+    skipped_blocks, skipped_people = c.execute('''
+        SELECT COUNT(DISTINCT pb.key_type || ' ' || pb.block), COUNT(DISTINCT pb.person_id)
+        FROM Person_Block pb
+        JOIN (
+            SELECT key_type, block FROM Person_Block
+            GROUP BY key_type, block
+            HAVING COUNT(*) > ?
+        ) big ON big.key_type = pb.key_type AND big.block = pb.block
+    ''', (MAX_BLOCK,)).fetchone()
+    c.execute('DROP TABLE temp.Person_Block')
+    return pairs, skipped_blocks, skipped_people
+
+
+def similar(a, b):
+    return SequenceMatcher(None, a, b).ratio() >= MATCH_THRESHOLD
+
+
+def names_match(a, b):
+    """Compare two token lists by first name, surname and middle initials.
+
+    Names whose numbers differ (e.g. 'Roe1' and 'Roe2') never match, and neither do
+    names with different middle initials when both have them ('John P. Smith' and
+    'John M. Smith'). A missing middle name is not a conflict.
+    """
+    if DIGITS.findall(' '.join(a)) != DIGITS.findall(' '.join(b)):
+        return False
+    middle_a = [t[0] for t in a[1:-1]]
+    middle_b = [t[0] for t in b[1:-1]]
+    if middle_a and middle_b and middle_a != middle_b:
+        return False
+    return similar(a[0], b[0]) and similar(a[-1], b[-1])
+
+
+def resolve_people_clusters(conn):
+    """Rebuild Person_Blocking_Key and Person_Cluster from People; the caller commits.
+    Returns the number of clusters holding more than one person."""
+    c = conn.cursor()
+    people = {person_id: normalize_name(name) for person_id, name in c.execute('SELECT person_id, name FROM People')}
+
+    c.execute('DROP TABLE IF EXISTS Person_Blocking_Key')
+    c.execute('''CREATE TABLE Person_Blocking_Key (
+        person_id INTEGER,
+        key_type TEXT,
+        key TEXT,
+        subkey TEXT
+    )''')
+    c.executemany('INSERT INTO Person_Blocking_Key VALUES (?, ?, ?, ?)',
+                  [(person_id, *key) for person_id, tokens in people.items() for key in blocking_keys(tokens)])
+    c.execute('CREATE INDEX idx_person_blocking_key ON Person_Blocking_Key (key_type, key, person_id)')
+
+    with build_stats.stage('person_blocking') as stage:
+        candidates, skipped_blocks, skipped_people = candidate_pairs(c)
+        stage['rows'] = len(candidates)
+        stage['skipped_blocks'] = skipped_blocks
+        stage['skipped_people'] = skipped_people
+
+    parent = {person_id: person_id for person_id in people}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in candidates:
+        if names_match(people[a], people[b]):
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+
+    c.execute('DROP TABLE IF EXISTS Person_Cluster')
+    c.execute('''CREATE TABLE Person_Cluster (
+        person_id INTEGER PRIMARY KEY,
+        cluster_id INTEGER NOT NULL
+    )''')
+    clusters = [(person_id, find(person_id)) for person_id in people]
+    c.executemany('INSERT INTO Person_Cluster VALUES (?, ?)', clusters)
+    c.execute('CREATE INDEX idx_person_cluster_cluster ON Person_Cluster (cluster_id)')
+
+    sizes = {}
+    for _person_id, cluster_id in clusters:
+        sizes[cluster_id] = sizes.get(cluster_id, 0) + 1
+    merged = sum(1 for size in sizes.values() if size > 1)
+    print(f'Resolved {len(people)} people into {len(sizes)} clusters ({merged} with more than one person, '
+          f'{len(candidates)} candidate pairs compared)')
+    if skipped_blocks:
+        print(f'Skipped {skipped_blocks} blocks of more than {MAX_BLOCK} people even after splitting '
+              f'({skipped_people} people in them)')
+    return merged
@@ -0,0 +1,193 @@
+"""
+Agg_Petition_Cube: petition counts pre-aggregated at the finest grain the dashboards query.
+
+Each row counts the distinct petitions for one combination of state, county, year,
+court, reasoning and result. Dashboards and queries/ sum these rows, so their cost
+depends on the number of distinct combinations, not on the number of petitions. A
+petition with several reasons or results is counted once under each one. Rollup rows
+hold the totals so that a petition is never counted twice:
+
+- reasoning_id 0 (party_accused ''): the petition whatever its reasons
+- result '*': the petition whatever its results
+
+So petitions per state is SUM(petition_count) WHERE reasoning_id = 0 AND result = '*',
+and petitions per reasoning is the same with result = '*' and reasoning_id != 0.
+Missing dimensions use '' for text and 0 for year and court_id instead of NULL, so
+that they can be part of the primary key.
+
+build_cube() fills the table from scratch after a build loads its rows, then creates
+triggers on Petitions, Petition_Reasoning_Lookup and Result. From then on every
+insert, delete or update of those rows (incremental builds, migrations) applies its
+exact change to the cube.
+"""
+
+import build_stats
+
+CUBE_KEY = 'state, county, year, court_id, reasoning_id, result'
+CUBE_COLUMNS = 'state, county, year, court_id, reasoning_id, party_accused, result, petition_count'
+UPSERT = f'ON CONFLICT ({CUBE_KEY}) DO UPDATE SET petition_count = petition_count + excluded.petition_count'
+
+
+def dims(ref):
+    """Cube dimensions of a Petitions row (NEW, OLD or an alias), with the sentinels"""
+    return (f"COALESCE({ref}.state, ''), COALESCE({ref}.county, ''), "
+            f"COALESCE({ref}.year_int, 0), COALESCE({ref}.court_id, 0)")
+
+
+def reasons_of(petition_id):
+    """The rollup reason plus the distinct reasons cited by one petition"""
+    return f'''(SELECT 0 AS reasoning_id, '' AS party_accused
+        UNION SELECT prl.reasoning_id, COALESCE(r.party_accused, '')
+        FROM Petition_Reasoning_Lookup prl LEFT JOIN Reasoning r ON r.reasoning_id = prl.reasoning_id
+        WHERE prl.petition_id = {petition_id} AND prl.reasoning_id IS NOT NULL)'''
+
+
+def results_of(petition_id):
+    """The rollup result plus the distinct results of one petition"""
+    return f'''(SELECT '*' AS result
+        UNION SELECT result FROM Result WHERE petition_id = {petition_id} AND result IS NOT NULL)'''
+
+
+def prune(ref):
+    """Drop the cube rows of one petition's cell that fell to zero"""
+    return f'''DELETE FROM Agg_Petition_Cube
+        WHERE (state, county, year, court_id) = ({dims(ref)}) AND petition_count <= 0;'''
+
+
+def prune_petition(ref):
+    """prune() for the petition a lookup row belongs to"""
+    return f'''DELETE FROM Agg_Petition_Cube
+        WHERE (state, county, year, court_id) IN
+            (SELECT {dims('p')} FROM Petitions p WHERE p.petition_id = {ref}.petition_id)
+        AND petition_count <= 0;'''
+
+
+def petition_delta(ref, sign):
+    """Add (sign 1) or remove (sign -1) a petition's whole contribution"""
+    statement = f'''INSERT INTO Agg_Petition_Cube ({CUBE_COLUMNS})
+        SELECT {dims(ref)}, rs.reasoning_id, rs.party_accused, res.result, {sign}
+        FROM {reasons_of(f'{ref}.petition_id')} rs, {results_of(f'{ref}.petition_id')} res
+        WHERE true {UPSERT};'''
+    return statement + (prune(ref) if sign < 0 else '')
+
+
+def reasoning_delta(ref, sign):
+    """Add or remove one reason of a petition: that reason under every result"""
+    statement = f'''INSERT INTO Agg_Petition_Cube ({CUBE_COLUMNS})
+        SELECT {dims('p')}, {ref}.reasoning_id,
+               COALESCE((SELECT party_accused FROM Reasoning WHERE reasoning_id = {ref}.reasoning_id), ''),
+               res.result, {sign}
+        FROM Petitions p, {results_of(f'{ref}.petition_id')} res
+        WHERE p.petition_id = {ref}.petition_id {UPSERT};'''
+    if sign < 0:
+        statement += prune_petition(ref)
+    return statement
+
+
+def result_delta(ref, sign):
+    """Add or remove one result of a petition: that result under every reason"""
+    statement = f'''INSERT INTO Agg_Petition_Cube ({CUBE_COLUMNS})
+        SELECT {dims('p')}, rs.reasoning_id, rs.party_accused, {ref}.result, {sign}
+        FROM Petitions p, {reasons_of(f'{ref}.petition_id')} rs
+        WHERE p.petition_id = {ref}.petition_id {UPSERT};'''
+    if sign < 0:
+        statement += prune_petition(ref)
+    return statement
+
+
+def unique_pair(table, column, ref, exclude_self):
+    """WHEN clause: ref's (petition_id, column) pair is the only such row in table"""
+    self_clause = f' AND rowid != {ref}.rowid' if exclude_self else ''
+    return (f'{ref}.{column} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {table} '
+            f'WHERE petition_id = {ref}.petition_id AND {column} = {ref}.{column}{self_clause})')
+
+
+def changed(*columns):
+    return '(' + ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in columns) + ')'
+
+
+def trigger_definitions():
+    """(name, CREATE TRIGGER body) for every trigger that maintains the cube.
+    An update of a lookup row counts as removing the old pair and adding the new one."""
+    prl, res = 'Petition_Reasoning_Lookup', 'Result'
+    prl_moved = changed('petition_id', 'reasoning_id')
+    res_moved = changed('petition_id', 'result')
+    return [
+        ('cube_petition_insert', f'AFTER INSERT ON Petitions BEGIN {petition_delta("NEW", 1)} END'),
+        ('cube_petition_delete', f'AFTER DELETE ON Petitions BEGIN {petition_delta("OLD", -1)} END'),
+        ('cube_petition_update', f'''AFTER UPDATE OF state, county, year_int, court_id ON Petitions
+            WHEN {changed("state", "county", "year_int", "court_id")} BEGIN {petition_delta("OLD", -1)} {petition_delta("NEW", 1)} END'''),
+        ('cube_reasoning_insert', f'''AFTER INSERT ON {prl} WHEN {unique_pair(prl, "reasoning_id", "NEW", True)}
+            BEGIN {reasoning_delta("NEW", 1)} END'''),
+        ('cube_reasoning_delete', f'''AFTER DELETE ON {prl} WHEN {unique_pair(prl, "reasoning_id", "OLD", False)}
+            BEGIN {reasoning_delta("OLD", -1)} END'''),
+        ('cube_reasoning_update_old', f'''AFTER UPDATE OF petition_id, reasoning_id ON {prl}
+            WHEN {prl_moved} AND {unique_pair(prl, "reasoning_id", "OLD", False)}
+            BEGIN {reasoning_delta("OLD", -1)} END'''),
+        ('cube_reasoning_update_new', f'''AFTER UPDATE OF petition_id, reasoning_id ON {prl}
+            WHEN {prl_moved} AND {unique_pair(prl, "reasoning_id", "NEW", True)}
+            BEGIN {reasoning_delta("NEW", 1)} END'''),
+        ('cube_result_insert', f'''AFTER INSERT ON {res} WHEN {unique_pair(res, "result", "NEW", True)}
+            BEGIN {result_delta("NEW", 1)} END'''),
+        ('cube_result_delete', f'''AFTER DELETE ON {res} WHEN {unique_pair(res, "result", "OLD", False)}
+            BEGIN {result_delta("OLD", -1)} END'''),
+        ('cube_result_update_old', f'''AFTER UPDATE OF petition_id, result ON {res}
+            WHEN {res_moved} AND {unique_pair(res, "result", "OLD", False)}
+            BEGIN {result_delta("OLD", -1)} END'''),
+        ('cube_result_update_new', f'''AFTER UPDATE OF petition_id, result ON {res}
+            WHEN {res_moved} AND {unique_pair(res, "result", "NEW", True)}
+            BEGIN {result_delta("NEW", 1)} END'''),
+    ]
+
+
+def create_cube_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS Agg_Petition_Cube (
+        state TEXT NOT NULL,
+        county TEXT NOT NULL,
+        year INTEGER NOT NULL,
+        court_id INTEGER NOT NULL,
+        reasoning_id INTEGER NOT NULL,
+        party_accused TEXT NOT NULL,
+        result TEXT NOT NULL,
+        petition_count INTEGER NOT NULL,
+        PRIMARY KEY (state, county, year, court_id, reasoning_id, result)
+    ) WITHOUT ROWID''')
+
+
+def rebuild_cube(conn):
+    """Recompute every cube row from the base tables in one pass; returns the row count"""
+    conn.execute('DELETE FROM Agg_Petition_Cube')
+    conn.execute(f'''
+        INSERT INTO Agg_Petition_Cube ({CUBE_COLUMNS})
+        SELECT {dims('p')}, rs.reasoning_id, rs.party_accused, res.result, COUNT(*)
+        FROM Petitions p
+        JOIN (SELECT petition_id, 0 AS reasoning_id, '' AS party_accused FROM Petitions
+              UNION SELECT prl.petition_id, prl.reasoning_id, COALESCE(r.party_accused, '')
+              FROM Petition_Reasoning_Lookup prl LEFT JOIN Reasoning r ON r.reasoning_id = prl.reasoning_id
+              WHERE prl.reasoning_id IS NOT NULL) rs ON rs.petition_id = p.petition_id
+        JOIN (SELECT petition_id, '*' AS result FROM Petitions
+              UNION SELECT petition_id, result FROM Result WHERE result IS NOT NULL) res
+            ON res.petition_id = p.petition_id
+        GROUP BY 1, 2, 3, 4, rs.reasoning_id, rs.party_accused, res.result
+    ''')
+    return conn.execute('SELECT COUNT(*) FROM Agg_Petition_Cube').fetchone()[0]
+
+
+def create_cube_triggers(conn):
+    for name, body in trigger_definitions():
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+        conn.execute(f'CREATE TRIGGER {name} {body}')
+
+
+def build_cube(conn):
+    """Rebuild Agg_Petition_Cube and (re)create its triggers; the caller commits"""
+    with build_stats.stage('cube') as stage:
+        create_cube_table(conn)
+        stage['rows'] = rebuild_cube(conn)
+        create_cube_triggers(conn)
+
+
+def ensure_cube(conn):
+    """Build the cube if this database has none yet; otherwise its triggers keep it current"""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'Agg_Petition_Cube'").fetchone():
+        build_cube(conn)
@@ -0,0 +1,211 @@
+"""
+Columnar export of the petitions as a denormalized Parquet fact table.
+
+Analyses that need petitions with their reasons, results and people have each been
+running the same five-table join through pandas.read_sql_query. export_petitions()
+writes the join once instead: one row per petition, with list columns for reasons
+(and the party each reason accuses), results and people, and dictionary-encoded
+repeated strings. The output is partitioned by state in hive layout:
+
+    dv_petitions_parquet/state=NC/petitions.parquet
+    dv_petitions_parquet/_manifest.json
+
+The manifest records a hash of the rows of every partition. A later export only
+rewrites the partitions whose rows changed and removes those of states that are gone,
+so running it after each build is cheap. load_petitions() reads the export back
+memory-mapped, optionally only some states and columns.
+
+Needs pyarrow (pip install pyarrow).
+
+Usage: python petition_export.py [--db dv_petitions.db] [--out DIR] [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+
+import build_stats
+
+DB_PATH = 'dv_petitions.db'
+MANIFEST = '_manifest.json'
+PARTITION_FILE = 'petitions.parquet'
+# pyarrow reads this partition value back as a null state
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+# Bump when the columns change so every partition is rewritten once
+FORMAT_VERSION = 1
+
+FACT_QUERY = '''
+    SELECT p.petition_id, p.parcel_number, p.archive, p.month, p.year, p.year_int, p.month_int,
+           p.county, c.court_name, p.years_married, ar.additional_requests,
+           (SELECT json_group_array(json_array(r.reasoning, r.party_accused))
+            FROM Petition_Reasoning_Lookup prl JOIN Reasoning r ON r.reasoning_id = prl.reasoning_id
+            WHERE prl.petition_id = p.petition_id),
+           (SELECT json_group_array(result) FROM Result WHERE petition_id = p.petition_id),
+           (SELECT json_group_array(pe.name)
+            FROM Petition_People_Lookup ppl JOIN People pe ON pe.person_id = ppl.person_id
+            WHERE ppl.petition_id = p.petition_id)
+    FROM Petitions p
+    LEFT JOIN Court c ON c.court_id = p.court_id
+    LEFT JOIN Additional_Requests ar ON ar.additional_requests_id = p.additional_requests_id
+    WHERE p.state IS ?
+    ORDER BY p.petition_id
+'''
+
+
+def default_export_dir(db_path):
+    return os.path.splitext(db_path)[0] + '_parquet'
+
+
+def import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit('The Parquet export needs pyarrow (pip install pyarrow)')
+    return pa, pq
+
+
+def fact_schema(pa):
+    """Arrow schema of a partition file; state comes from the partition directory"""
+    labels = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('petition_id', pa.int64()),
+        ('parcel_number', pa.string()),
+        ('archive', labels),
+        ('month', labels),
+        ('year', pa.string()),
+        ('year_int', pa.int32()),
+        ('month_int', pa.int8()),
+        ('county', labels),
+        ('court', labels),
+        ('years_married', pa.string()),
+        ('additional_requests', labels),
+        ('reasons', pa.list_(labels)),
+        ('parties_accused', pa.list_(labels)),
+        ('results', pa.list_(labels)),
+        ('people', pa.list_(pa.string())),
+    ])
+
+
+def partition_name(state):
+    return f'state={NULL_PARTITION if state is None else state}'
+
+
+def partition_hash(rows):
+    payload = json.dumps([FORMAT_VERSION, rows], separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def fact_table(pa, rows):
+    """Build the Arrow table of one partition from FACT_QUERY rows"""
+    columns = {name: [] for name in fact_schema(pa).names}
+    for (petition_id, parcel, archive, month, year, year_int, month_int, county, court,
+         years_married, requests, reasons, results, people) in rows:
+        reasons = json.loads(reasons)
+        columns['petition_id'].append(petition_id)
+        columns['parcel_number'].append(parcel)
+        columns['archive'].append(archive)
+        columns['month'].append(month)
+        columns['year'].append(year)
+        columns['year_int'].append(year_int)
+        columns['month_int'].append(month_int)
+        columns['county'].append(county)
+        columns['court'].append(court)
+        columns['years_married'].append(years_married)
+        columns['additional_requests'].append(requests)
+        columns['reasons'].append([reasoning for reasoning, _party in reasons])
+        columns['parties_accused'].append([party for _reasoning, party in reasons])
+        columns['results'].append(json.loads(results))
+        columns['people'].append(json.loads(people))
+    schema = fact_schema(pa)
+    # Build with plain strings, then cast to the dictionary-encoded schema
+    plain = pa.schema([pa.field(f.name, pa.list_(pa.string()) if pa.types.is_list(f.type) else
+                                pa.string() if pa.types.is_dictionary(f.type) else f.type)
+                       for f in schema])
+    return pa.table(columns, schema=plain).cast(schema)
+
+
+def write_atomic(pq, table, path):
+    tmp_path = path + '.tmp'
+    pq.write_table(table, tmp_path, compression='zstd', use_dictionary=True)
+    os.replace(tmp_path, path)
+
+
+def read_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def export_petitions(db_path=DB_PATH, out_dir=None, force=False):
+    """Write or refresh the Parquet export of db_path.
+    Returns the number of partitions rewritten."""
+    pa, pq = import_pyarrow()
+    out_dir = out_dir or default_export_dir(db_path)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {} if force else read_manifest(out_dir)
+
+    conn = sqlite3.connect(db_path)
+    written = 0
+    with build_stats.stage('export') as stage:
+        build_stats.watch(conn)
+        states = [state for (state,) in conn.execute('SELECT DISTINCT state FROM Petitions ORDER BY state')]
+        current = {}
+        exported_rows = 0
+        for state in states:
+            name = partition_name(state)
+            rows = conn.execute(FACT_QUERY, (state,)).fetchall()
+            digest = partition_hash(rows)
+            current[name] = digest
+            path = os.path.join(out_dir, name, PARTITION_FILE)
+            if manifest.get(name) == digest and os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(pq, fact_table(pa, rows), path)
+            written += 1
+            exported_rows += len(rows)
+            print(f'Exported {len(rows)} petitions to {path}')
+        for name in set(manifest) - set(current):
+            shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)
+            print(f'Removed partition {name}')
+        write_manifest(out_dir, current)
+        stage['rows'] = exported_rows
+    conn.close()
+    print(f'Export in {out_dir} is current ({written} of {len(current)} partitions rewritten)')
+    return written
+
+
+def load_petitions(out_dir=None, states=None, columns=None):
+    """Read the export as a pandas DataFrame, memory-mapped. states and columns
+    restrict what is read; list columns come back as arrays of strings."""
+    _pa, pq = import_pyarrow()
+    out_dir = out_dir or default_export_dir(DB_PATH)
+    filters = [('state', 'in', list(states))] if states else None
+    table = pq.read_table(out_dir, columns=columns, filters=filters, memory_map=True, partitioning='hive')
+    return table.to_pandas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export petitions as a state-partitioned Parquet fact table')
+    parser.add_argument('--db', default=DB_PATH, help='Database to export (default: %(default)s)')
+    parser.add_argument('--out', help='Export directory (default: <db name>_parquet next to the database)')
+    parser.add_argument('--force', action='store_true', help='Rewrite every partition even if unchanged')
+    args = parser.parse_args()
+    build_stats.configure()
+    export_petitions(args.db, args.out, args.force)
+
+
+if __name__ == '__main__':
+    main()
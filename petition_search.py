@@ -0,0 +1,176 @@
+"""
+Petition_Search: FTS5 full-text index with one document per petition.
+
+Each document is keyed by petition_id (the FTS rowid) and holds the parcel number,
+the archive, the names of the people linked to the petition, the reasons it cites and
+every one of its additional requests (Petition_Requests_Lookup, one row per request). search() ranks matches with bm25 and pages through them,
+so looking up a petition by party name or request text uses the index instead of
+LIKE '%...%' scans over every table.
+
+build_search() indexes every petition after a build loads its rows, then creates
+triggers. When a petition or one of its linked rows is inserted, deleted or changed,
+the trigger rebuilds that petition's document.
+"""
+
+import re
+
+import build_stats
+
+# Column weights for bm25(): a hit on the parcel number or a name outranks one in the reasons
+COLUMNS = ['parcel_number', 'archive', 'people', 'reasoning', 'requests']
+WEIGHTS = [10.0, 1.0, 5.0, 2.0, 1.0]
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def document(condition=None):
+    """SELECT producing the search documents of the petitions matching condition (all by default)"""
+    where = f'WHERE {condition}' if condition else ''
+    return f'''
+        SELECT p.petition_id, p.parcel_number, p.archive,
+            (SELECT group_concat(name, ' ') FROM People WHERE person_id IN (
+                SELECT person_id FROM Petition_People_Lookup WHERE petition_id = p.petition_id
+                UNION SELECT p.petitioner_id UNION SELECT p.defendant_id)),
+            (SELECT group_concat(DISTINCT r.reasoning) FROM Petition_Reasoning_Lookup prl
+                JOIN Reasoning r ON r.reasoning_id = prl.reasoning_id WHERE prl.petition_id = p.petition_id),
+            (SELECT group_concat(ar.additional_requests, ', ') FROM Petition_Requests_Lookup prq
+                JOIN Additional_Requests ar ON ar.additional_requests_id = prq.additional_requests_id
+                WHERE prq.petition_id = p.petition_id)
+        FROM Petitions p {where}'''
+
+
+def reindex(petition_id):
+    """Trigger statements replacing one petition's document"""
+    return (f'DELETE FROM Petition_Search WHERE rowid = {petition_id}; '
+            f'INSERT INTO Petition_Search (rowid, {", ".join(COLUMNS)}) {document(f"p.petition_id = {petition_id}")};')
+
+
+def reindex_linked(link_table, key, ref):
+    """Trigger statements re-indexing every petition that links to a changed row"""
+    petitions = f'SELECT petition_id FROM {link_table} WHERE {key} = {ref}.{key}'
+    if link_table == 'Petition_People_Lookup':
+        petitions += (f' UNION SELECT petition_id FROM Petitions '
+                      f'WHERE petitioner_id = {ref}.{key} OR defendant_id = {ref}.{key}')
+    return (f'DELETE FROM Petition_Search WHERE rowid IN ({petitions}); '
+            f'INSERT INTO Petition_Search (rowid, {", ".join(COLUMNS)}) '
+            f'{document(f"p.petition_id IN ({petitions})")};')
+
+
+def trigger_definitions():
+    """(name, CREATE TRIGGER body) for every trigger that keeps Petition_Search in sync"""
+    prl, ppl, prq = 'Petition_Reasoning_Lookup', 'Petition_People_Lookup', 'Petition_Requests_Lookup'
+    return [
+        ('search_petition_insert', f'AFTER INSERT ON Petitions BEGIN {reindex("NEW.petition_id")} END'),
+        ('search_petition_delete', 'AFTER DELETE ON Petitions BEGIN DELETE FROM Petition_Search WHERE rowid = OLD.petition_id; END'),
+        ('search_petition_update', f'''AFTER UPDATE OF parcel_number, archive, petitioner_id, defendant_id,
+            additional_requests_id ON Petitions BEGIN {reindex("NEW.petition_id")} END'''),
+        ('search_reasoning_insert', f'AFTER INSERT ON {prl} BEGIN {reindex("NEW.petition_id")} END'),
+        ('search_reasoning_delete', f'AFTER DELETE ON {prl} BEGIN {reindex("OLD.petition_id")} END'),
+        ('search_reasoning_update', f'''AFTER UPDATE ON {prl}
+            BEGIN {reindex("OLD.petition_id")} {reindex("NEW.petition_id")} END'''),
+        ('search_people_insert', f'AFTER INSERT ON {ppl} BEGIN {reindex("NEW.petition_id")} END'),
+        ('search_people_delete', f'AFTER DELETE ON {ppl} BEGIN {reindex("OLD.petition_id")} END'),
+        ('search_people_update', f'''AFTER UPDATE ON {ppl}
+            BEGIN {reindex("OLD.petition_id")} {reindex("NEW.petition_id")} END'''),
+        ('search_person_rename', f'''AFTER UPDATE OF name ON People
+            BEGIN {reindex_linked(ppl, "person_id", "NEW")} END'''),
+        ('search_person_delete', f'''AFTER DELETE ON People
+            BEGIN {reindex_linked(ppl, "person_id", "OLD")} END'''),
+        ('search_reason_rename', f'''AFTER UPDATE OF reasoning ON Reasoning
+            BEGIN {reindex_linked(prl, "reasoning_id", "NEW")} END'''),
+        ('search_request_insert', f'AFTER INSERT ON {prq} BEGIN {reindex("NEW.petition_id")} END'),
+        ('search_request_delete', f'AFTER DELETE ON {prq} BEGIN {reindex("OLD.petition_id")} END'),
+        ('search_request_update', f'''AFTER UPDATE ON {prq}
+            BEGIN {reindex("OLD.petition_id")} {reindex("NEW.petition_id")} END'''),
+        ('search_requests_update', f'''AFTER UPDATE OF additional_requests ON Additional_Requests
+            BEGIN {reindex_linked(prq, "additional_requests_id", "NEW")} END'''),
+    ]
+
+
+def create_request_links(conn):
+    """Create Petition_Requests_Lookup, which links a petition to every request in its
+    additional_requests cell (Petitions.additional_requests_id holds only the first).
+
+    A database built before the table existed kept no other requests, so there it is
+    filled from Petitions.additional_requests_id. A no-op when the table exists.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'Petition_Requests_Lookup'").fetchone():
+        return
+    conn.execute('''CREATE TABLE Petition_Requests_Lookup (
+        petition_id INTEGER,
+        additional_requests_id INTEGER
+    )''')
+    conn.execute('''INSERT INTO Petition_Requests_Lookup
+                    SELECT petition_id, additional_requests_id FROM Petitions
+                    WHERE additional_requests_id IS NOT NULL''')
+    # Created with the table rather than by index_petitions(), which runs before search on older databases
+    conn.execute('CREATE INDEX idx_prq_petition_request ON Petition_Requests_Lookup (petition_id, additional_requests_id)')
+    conn.execute('CREATE INDEX idx_prq_request_petition ON Petition_Requests_Lookup (additional_requests_id, petition_id)')
+
+
+def create_search_table(conn):
+    conn.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS Petition_Search USING fts5(
+        {", ".join(COLUMNS)},
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )''')
+
+
+def rebuild_search(conn):
+    """Re-index every petition; returns the number of documents"""
+    conn.execute('DELETE FROM Petition_Search')
+    conn.execute(f'INSERT INTO Petition_Search (rowid, {", ".join(COLUMNS)}) {document()}')
+    conn.execute("INSERT INTO Petition_Search (Petition_Search) VALUES ('optimize')")
+    return conn.execute('SELECT COUNT(*) FROM Petition_Search').fetchone()[0]
+
+
+def create_search_triggers(conn):
+    for name, body in trigger_definitions():
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+        conn.execute(f'CREATE TRIGGER {name} {body}')
+
+
+def build_search(conn):
+    """Rebuild Petition_Search and (re)create its triggers; the caller commits"""
+    with build_stats.stage('search') as stage:
+        create_request_links(conn)
+        create_search_table(conn)
+        stage['rows'] = rebuild_search(conn)
+        create_search_triggers(conn)
+
+
+def ensure_search(conn):
+    """Build the index if this database has none yet, or has one from before one of its
+    triggers existed; otherwise its triggers keep it current"""
+    names = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    if 'Petition_Search' not in names or any(name not in names for name, _body in trigger_definitions()):
+        build_search(conn)
+
+
+def match_query(text):
+    """Turn free text into an FTS5 query: every word must match, as a word or a prefix.
+    Returns None when the text has no searchable words."""
+    tokens = TOKEN.findall(text or '')
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search(conn, text, limit=20, offset=0):
+    """Return (total, rows) for the petitions matching text, best match first.
+    Each row is (petition_id, parcel_number, state, county, year, snippet, score)."""
+    query = match_query(text)
+    if query is None:
+        return 0, []
+    total = conn.execute('SELECT COUNT(*) FROM Petition_Search WHERE Petition_Search MATCH ?', (query,)).fetchone()[0]
+    weights = ', '.join(str(w) for w in WEIGHTS)
+    rows = conn.execute(f'''
+        SELECT p.petition_id, p.parcel_number, p.state, p.county, p.year,
+               snippet(Petition_Search, -1, '[', ']', '...', 12) AS snippet,
+               bm25(Petition_Search, {weights}) AS score
+        FROM Petition_Search
+        JOIN Petitions p ON p.petition_id = Petition_Search.rowid
+        WHERE Petition_Search MATCH ?
+        ORDER BY score
+        LIMIT ? OFFSET ?
+    ''', (query, limit, offset)).fetchall()
+    return total, rows
@@ -13,10 +13,11 @@ db_path = 'database.db'
 query = '''
 SELECT 
     c.state,
-    c.court,
+    c.court_name AS court,
     COUNT(*) as court_count
-FROM Court c
-GROUP BY c.state, c.court
+FROM Petitions p
+JOIN Court c ON p.court_id = c.court_id
+GROUP BY c.state, c.court_name
 ORDER BY c.state, court_count DESC
 '''
 
@@ -25,7 +26,7 @@ df = pd.read_sql_query(query, conn)
 conn.close()
 
 # Find most common courts per state
-most_common = df.sort_values(['state', 'court'], ascending=[True, False])
+most_common = df.sort_values(['state', 'court_count'], ascending=[True, False])
 top3_courts = most_common.groupby('state').head(3)
 for state in top3_courts['state'].unique():
     print(f"\n{state}:")
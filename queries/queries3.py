@@ -12,15 +12,15 @@ db_path = 'database.db'
 
 query = '''
 SELECT 
-    p.state,
+    c.state,
     r.reasoning,
-    p.year,
-    COUNT(*) as reasoning_count
-FROM Reasoning r
-JOIN Petition_Reasoning_Lookup prl ON r.reasoning_id = prl.reasoning_id
-JOIN Petitions p ON prl.petition_id = p.petition_id
-GROUP BY p.state, r.reasoning, p.year
-ORDER BY p.state, p.year, reasoning_count DESC
+    c.year,
+    SUM(c.petition_count) as reasoning_count
+FROM Agg_Petition_Cube c
+JOIN Reasoning r ON r.reasoning_id = c.reasoning_id
+WHERE c.result = '*' AND c.year != 0
+GROUP BY c.state, r.reasoning, c.year
+ORDER BY c.state, c.year, reasoning_count DESC
 '''
 
 conn = sqlite3.connect('dv_petitions.db')
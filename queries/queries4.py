@@ -12,14 +12,14 @@ db_path = 'database.db'
 
 query = '''
 SELECT 
-    p.state,
+    c.state,
     r.reasoning,
-    COUNT(*) as reasoning_count
-FROM Reasoning r
-JOIN Petition_Reasoning_Lookup prl ON r.reasoning_id = prl.reasoning_id
-JOIN Petitions p ON prl.petition_id = p.petition_id
-GROUP BY p.state, r.reasoning
-ORDER BY p.state, reasoning_count DESC
+    SUM(c.petition_count) as reasoning_count
+FROM Agg_Petition_Cube c
+JOIN Reasoning r ON r.reasoning_id = c.reasoning_id
+WHERE c.result = '*'
+GROUP BY c.state, r.reasoning
+ORDER BY c.state, reasoning_count DESC
 '''
 
 conn = sqlite3.connect('dv_petitions.db')
@@ -2,15 +2,27 @@
 
 This script answers the question: How often did each state see interracial sex as a reasoning? 
 
+Other reasoning terms can be passed on the command line in their raw, transcribed
+form, e.g. python queries/queries5.py 'interracial_sex(M)' 'prostitution(F)'
 
 """
 
+import os
 import sqlite3
+import sys
+
 import pandas as pd
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from reasoning_normalizer import reasoning_filter
+
 db_path = 'database.db'
 
-query = '''
+terms = sys.argv[1:] or ['interracial_sex(M)', 'interracial_sex(F)']
+# Stored terms are cleaned ('interracial_sex' + party_accused), so match through the normalizer
+where, params = reasoning_filter(terms)
+
+query = f'''
 SELECT 
     p.state,
     r.reasoning,
@@ -18,7 +30,7 @@ SELECT
 FROM Reasoning r
 JOIN Petition_Reasoning_Lookup prl ON r.reasoning_id = prl.reasoning_id
 JOIN Petitions p ON prl.petition_id = p.petition_id
-WHERE r.reasoning IN ('interracial_sex(M)', 'interracial_sex(F)')
+WHERE {where}
 GROUP BY p.state, r.reasoning
 '''
 
@@ -26,7 +38,7 @@ GROUP BY p.state, r.reasoning
 
 
 conn = sqlite3.connect('dv_petitions.db')
-df = pd.read_sql_query(query, conn)
+df = pd.read_sql_query(query, conn, params=params)
 conn.close()
 
 # How many instances of interracial sex in each state 
@@ -34,4 +46,4 @@ interracial_sex = df.sort_values(['state', 'petition_count'], ascending=[True, F
 top_petitions = interracial_sex.groupby(['state']).first().reset_index()
 for _, row in top_petitions.iterrows():
 
-    print(f"State: {row['state']} ({row['petition_count']} cases)")
\ No newline at end of file
+    print(f"State: {row['state']} ({row['petition_count']} cases)")
@@ -13,15 +13,14 @@ conn = sqlite3.connect('dv_petitions.db')
 # SQL query: Get state, reasoning, and count for granted petitions
 query = '''
 SELECT 
-    p.state,
+    c.state,
     r.reasoning,
-    COUNT(*) as reasoning_count
-FROM Petitions p
-JOIN Petition_Reasoning_Lookup prl ON p.petition_id = prl.petition_id
-JOIN Reasoning r ON prl.reasoning_id = r.reasoning_id
-WHERE p.result = 'granted'
-GROUP BY p.state, r.reasoning
-ORDER BY p.state, reasoning_count DESC
+    SUM(c.petition_count) as reasoning_count
+FROM Agg_Petition_Cube c
+JOIN Reasoning r ON r.reasoning_id = c.reasoning_id
+WHERE c.result = 'granted'
+GROUP BY c.state, r.reasoning
+ORDER BY c.state, reasoning_count DESC
 '''
 
 df = pd.read_sql_query(query, conn)
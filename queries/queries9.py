@@ -5,33 +5,20 @@ DB_PATH = 'dv_petitions.db'
 def main():
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
+    # One row per year text, so '1843?' or 'c. 1840' keep their own rows. Plain numeric
+    # years (text equal to the parsed year_int) sort first by value, then the other
+    # texts alphabetically, then petitions without a year (NULL or empty) as one Unknown row
     cur.execute("""
-        SELECT year, COUNT(*) AS petition_count
+        SELECT NULLIF(trim(year), '') AS year_text, MAX(year_int) AS year_num, COUNT(*) AS petition_count
         FROM Petitions
-        GROUP BY year
+        GROUP BY year_text
+        ORDER BY year_text IS NULL, year_text IS NOT CAST(year_num AS TEXT),
+                 CASE WHEN year_text = CAST(year_num AS TEXT) THEN year_num END, lower(year_text)
     """)
     rows = cur.fetchall()
     conn.close()
 
-    # Normalize year display and sort: numeric years first (asc), then non-numeric, then Unknown
-    normalized = []
-    for year, cnt in rows:
-        if year is None or (isinstance(year, str) and year.strip() == ""):
-            display = "Unknown"
-        else:
-            display = str(year).strip()
-        normalized.append((display, cnt))
-
-    def sort_key(item):
-        y = item[0]
-        if y == "Unknown":
-            return (2, 0)
-        try:
-            return (0, int(y))
-        except Exception:
-            return (1, y.lower())
-
-    normalized.sort(key=sort_key)
+    normalized = [("Unknown" if year is None else year, cnt) for year, _year_num, cnt in rows]
 
     print(f"{'year':<10} {'petitions':>10}")
     for year, cnt in normalized:
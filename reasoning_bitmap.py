@@ -0,0 +1,213 @@
+"""
+Per-petition reasoning bitmaps for fast multi-reason filtering.
+
+Petition_Reasoning_Bitmap stores one BLOB per petition in which bit n is set when the
+petition cites reasoning_id n (numpy.packbits, little bit order). load_index() reads
+the bitmaps into a NumPy matrix of 64-bit words, together with each petition's year,
+state and county. Multi-reason filters then reduce to a few vectorized bitwise
+operations over that matrix instead of the per-filter COUNT(DISTINCT CASE ...) and
+GROUP_CONCAT over every petition:
+
+    index = load_index(conn)
+    mask = select_petitions(index, ['adultery', 'desertion'], match='all', years=(1830, 1850))
+    rows = counts_by_county(index, ['adultery', 'desertion'], match='any')
+
+Reasons may be reasoning_ids, raw terms as transcribed ('adultery(M)') or stored
+reasoning names ('adultery', matching every party accused).
+
+build_bitmaps() fills in the bitmaps of petitions that have none and creates triggers
+that drop a petition's bitmap whenever its Petition_Reasoning_Lookup rows change. The
+next build_bitmaps() call recomputes those, and load_index() computes any that are
+missing in memory, so the index is never stale even on a read-only connection.
+
+Usage: python reasoning_bitmap.py [--db dv_petitions.db] [--all] [--years FROM TO] REASON...
+"""
+
+import argparse
+import sqlite3
+import time
+from collections import defaultdict
+
+import numpy as np
+
+import build_stats
+from reasoning_normalizer import load_reasoning_ids, normalize_term
+
+DB_PATH = 'dv_petitions.db'
+
+
+def create_bitmap_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS Petition_Reasoning_Bitmap (
+        petition_id INTEGER PRIMARY KEY,
+        bitmap BLOB NOT NULL
+    )''')
+
+
+def create_bitmap_triggers(conn):
+    """Triggers that drop the bitmap of every petition whose reasons change"""
+    drop = 'DELETE FROM Petition_Reasoning_Bitmap WHERE petition_id = {}.petition_id;'
+    triggers = [
+        ('bitmap_reasoning_insert', f'AFTER INSERT ON Petition_Reasoning_Lookup BEGIN {drop.format("NEW")} END'),
+        ('bitmap_reasoning_delete', f'AFTER DELETE ON Petition_Reasoning_Lookup BEGIN {drop.format("OLD")} END'),
+        ('bitmap_reasoning_update', f'''AFTER UPDATE ON Petition_Reasoning_Lookup
+            BEGIN {drop.format("OLD")} {drop.format("NEW")} END'''),
+        ('bitmap_petition_delete', f'AFTER DELETE ON Petitions BEGIN {drop.format("OLD")} END'),
+    ]
+    for name, body in triggers:
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+        conn.execute(f'CREATE TRIGGER {name} {body}')
+
+
+def encode(reasoning_ids):
+    """Pack a collection of reasoning_ids into a bitmap BLOB"""
+    bits = np.zeros(max(reasoning_ids, default=0) + 1, dtype=np.uint8)
+    bits[list(reasoning_ids)] = 1
+    return np.packbits(bits, bitorder='little').tobytes()
+
+
+def petition_bitmaps(conn, missing_only=True):
+    """Compute (petition_id, bitmap) from Petition_Reasoning_Lookup, by default only
+    for the petitions without a stored bitmap"""
+    where = ('WHERE p.petition_id NOT IN (SELECT petition_id FROM Petition_Reasoning_Bitmap)'
+             if missing_only else '')
+    reasons = {}
+    for petition_id, reasoning_id in conn.execute(f'''
+        SELECT p.petition_id, prl.reasoning_id
+        FROM Petitions p
+        LEFT JOIN Petition_Reasoning_Lookup prl ON prl.petition_id = p.petition_id
+        {where}
+    '''):
+        ids = reasons.setdefault(petition_id, set())
+        if reasoning_id is not None:
+            ids.add(reasoning_id)
+    return [(petition_id, encode(ids)) for petition_id, ids in reasons.items()]
+
+
+def build_bitmaps(conn):
+    """Create the bitmap table and triggers and store every missing bitmap; the caller commits"""
+    with build_stats.stage('bitmaps') as stage:
+        create_bitmap_table(conn)
+        create_bitmap_triggers(conn)
+        rows = petition_bitmaps(conn)
+        conn.executemany('INSERT INTO Petition_Reasoning_Bitmap VALUES (?, ?)', rows)
+        stage['rows'] = len(rows)
+
+
+def load_index(conn):
+    """Read every petition's bitmap, year, state and county into NumPy arrays.
+
+    Returns a dict: petition_id, year (0 when unknown), county (codes into
+    locations), locations ((state, county) pairs), words (one row of uint64 words per
+    petition), and the maps used to resolve reasons.
+    """
+    has_table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'Petition_Reasoning_Bitmap'").fetchone() is not None
+    # Bitmaps dropped by the triggers, or all of them before the first build_bitmaps()
+    bitmaps = dict(petition_bitmaps(conn, missing_only=has_table))
+    if has_table:
+        bitmaps.update(conn.execute('SELECT petition_id, bitmap FROM Petition_Reasoning_Bitmap'))
+    petitions = conn.execute('''
+        SELECT petition_id, COALESCE(year_int, 0), COALESCE(state, ''), COALESCE(county, '')
+        FROM Petitions ORDER BY petition_id
+    ''').fetchall()
+
+    max_id = conn.execute('SELECT COALESCE(MAX(reasoning_id), 0) FROM Reasoning').fetchone()[0]
+    width = (max_id // 64 + 1) * 8  # bytes per row, a whole number of 64-bit words
+    packed = np.zeros((len(petitions), width), dtype=np.uint8)
+    for row, (petition_id, _year, _state, _county) in enumerate(petitions):
+        bitmap = np.frombuffer(bitmaps.get(petition_id, b''), dtype=np.uint8)[:width]
+        packed[row, :len(bitmap)] = bitmap
+
+    location_codes = {}
+    county = [location_codes.setdefault((state, county), len(location_codes))
+              for _pid, _year, state, county in petitions]
+    names = defaultdict(list)
+    for reasoning_id, reasoning in conn.execute('SELECT reasoning_id, reasoning FROM Reasoning'):
+        names[reasoning].append(reasoning_id)
+    return {
+        'petition_id': np.array([row[0] for row in petitions], dtype=np.int64),
+        'year': np.array([row[1] for row in petitions], dtype=np.int32),
+        'county': np.array(county, dtype=np.int32),
+        'locations': list(location_codes),
+        'words': packed.view('<u8'),
+        'terms': load_reasoning_ids(conn),
+        'names': dict(names),
+    }
+
+
+def resolve_reasons(index, reasons):
+    """Map each requested reason to the list of reasoning_ids it stands for
+    (empty when it matches nothing)"""
+    groups = []
+    for reason in reasons:
+        if isinstance(reason, (int, np.integer)):
+            groups.append([int(reason)])
+            continue
+        term = normalize_term(reason)[0]
+        if term in index['terms']:
+            groups.append([index['terms'][term]])
+        else:
+            groups.append(index['names'].get(reason.strip(), []))
+    return groups
+
+
+def word_mask(index, reasoning_ids):
+    """One row of uint64 words with the bits of reasoning_ids set"""
+    n_bits = index['words'].shape[1] * 64
+    bits = np.zeros(n_bits, dtype=np.uint8)
+    bits[[i for i in reasoning_ids if 0 <= i < n_bits]] = 1
+    return np.packbits(bits, bitorder='little').view('<u8')
+
+
+def select_petitions(index, reasons, match='any', years=None):
+    """Boolean mask over the index rows: petitions citing any (or all) of reasons,
+    optionally with a year in the inclusive range years=(first, last)"""
+    groups = resolve_reasons(index, reasons)
+    words = index['words']
+    if match == 'all':
+        selected = np.ones(len(words), dtype=bool)
+        for group in groups:
+            selected &= (words & word_mask(index, group)).any(axis=1)
+    elif match == 'any':
+        selected = (words & word_mask(index, [i for group in groups for i in group])).any(axis=1)
+    else:
+        raise ValueError(f"match must be 'any' or 'all', not {match!r}")
+    if years is not None:
+        first, last = years
+        selected &= (index['year'] >= first) & (index['year'] <= last)
+    return selected
+
+
+def counts_by_county(index, reasons, match='any', years=None):
+    """Return [(state, county, petitions)] for the selected petitions, largest first"""
+    selected = select_petitions(index, reasons, match, years)
+    counts = np.bincount(index['county'][selected], minlength=len(index['locations']))
+    rows = [(*index['locations'][code], int(counts[code])) for code in np.flatnonzero(counts)]
+    return sorted(rows, key=lambda row: -row[2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count petitions citing reasons, by county, using the reasoning bitmaps')
+    parser.add_argument('reasons', nargs='+', help='Reasoning names or raw terms, e.g. adultery or adultery(M)')
+    parser.add_argument('--db', default=DB_PATH, help='Database to read (default: %(default)s)')
+    parser.add_argument('--all', action='store_true', help='Require every reason instead of any of them')
+    parser.add_argument('--years', nargs=2, type=int, metavar=('FROM', 'TO'), help='Inclusive year range')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    index = load_index(conn)
+    conn.close()
+    loaded = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows = counts_by_county(index, args.reasons, 'all' if args.all else 'any', args.years)
+    elapsed = time.perf_counter() - start
+    for state, county, count in rows:
+        print(f'{state:<4} {county:<30} {count:6d}')
+    print(f'{sum(row[2] for row in rows)} of {len(index["petition_id"])} petitions '
+          f'(index loaded in {loaded * 1000:.1f} ms, query took {elapsed * 1000:.3f} ms)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Shared normalizer for reasoning terms.
+
+Transcribed reasoning terms carry the accused party as a suffix, e.g.
+'interracial_sex(M)' or 'prostitution(F)'. The ETL stores them in the Reasoning
+table as the cleaned term plus a party_accused column, after applying the
+terminology replacements below. Query scripts use the same functions, so they can
+be written against the raw, suffixed terms.
+"""
+
+from functools import lru_cache
+
+# Define terminology replacements for reasoning terms
+REASONING_REPLACEMENTS = {
+    'prostitution(F)': 'sex_work(F)',
+    'adultery_with_prostitute(M)': 'adultery_with_sex_worker(M)',
+    'possible_prostitution(F)': 'possible_sex_work(F)',
+    'allowed_prostitution_in_his_home(M)': 'allowed_sex_work_in_home(M)',
+    'sex_with_prostitutes(M)': 'sex_with_sex_workers(M)',
+    'adultery_with_prostitutes(M)': 'adultery_with_sex_workers(M)',
+    'birth_mulatto_children(F)': 'birth_mixed_race_children(F)',
+    'birth_mulatto_child(F)': 'birth_mixed_race_child(F)',
+    'father_mulatto_child(M)': 'father_mixed_race_child(M)',
+    'father_mulatto_children(M)': 'father_mixed_race_children(M)',
+    'homosexual(M)': 'same_sex_attraction(M)'
+}
+
+# Suffix -> party_accused value stored in Reasoning
+PARTY_SUFFIXES = {
+    '(M)': 'husband_accused',
+    '(F)': 'wife_accused',
+}
+
+
+@lru_cache(maxsize=4096)
+def normalize_term(term):
+    """Normalize one raw reasoning term.
+
+    Returns (term, clean_term, party_accused): the term after terminology replacement
+    (the key the ETL assigns ids by), the term without its (M)/(F) suffix as stored in
+    Reasoning.reasoning, and the matching party_accused value or None.
+    """
+    term = term.strip()
+    term = REASONING_REPLACEMENTS.get(term, term)
+    party_accused = PARTY_SUFFIXES.get(term[-3:])
+    clean_term = term[:-3] if party_accused else term
+    return term, clean_term, party_accused
+
+
+def split_terms(cell):
+    """Split a comma-separated reasoning cell into normalized (term, clean_term, party_accused) tuples"""
+    return [normalize_term(t) for t in (cell or '').split(',') if t.strip()]
+
+
+def stored_term(clean_term, party_accused):
+    """Rebuild the suffixed term from a Reasoning row's reasoning and party_accused"""
+    for suffix, party in PARTY_SUFFIXES.items():
+        if party == party_accused:
+            return clean_term + suffix
+    return clean_term
+
+
+def load_reasoning_ids(conn):
+    """Return {term: reasoning_id} for every term already stored in Reasoning"""
+    return {
+        stored_term(clean_term, party_accused): reasoning_id
+        for reasoning_id, clean_term, party_accused in conn.execute(
+            'SELECT reasoning_id, reasoning, party_accused FROM Reasoning')
+    }
+
+
+def reasoning_ids(conn, raw_terms):
+    """Resolve user-supplied raw terms (suffixed or not) to reasoning_ids; unknown terms are skipped"""
+    ids = load_reasoning_ids(conn)
+    resolved = []
+    for raw in raw_terms:
+        term = normalize_term(raw)[0]
+        if term in ids and ids[term] not in resolved:
+            resolved.append(ids[term])
+    return resolved
+
+
+def reasoning_filter(raw_terms, alias='r'):
+    """Build a WHERE fragment matching Reasoning rows for raw terms.
+
+    Returns (sql, params), e.g. for ['interracial_sex(M)']:
+    ("(r.reasoning = ? AND r.party_accused IS ?)", ['interracial_sex', 'husband_accused']).
+    """
+    clauses = []
+    params = []
+    for raw in raw_terms:
+        _term, clean_term, party_accused = normalize_term(raw)
+        clauses.append(f'({alias}.reasoning = ? AND {alias}.party_accused IS ?)')
+        params.extend([clean_term, party_accused])
+    return '(' + ' OR '.join(clauses or ['0']) + ')', params
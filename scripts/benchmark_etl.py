@@ -0,0 +1,146 @@
+"""
+ETL scaling benchmark.
+
+Generates seeded synthetic corpora at multiples of the real 296-petition dataset,
+then times each stage of the pipeline at every scale:
+
+- build / build_stream: database.db.py's full-build ETL engines
+- migrate_people / create_court_table: those migrations from migrations.py on their own
+- migrate: migrate_inplace(), i.e. the backup copy plus every pending migration
+
+Every stage runs in its own spawned process, so the peak RSS it reports belongs to that
+stage alone; migration stages start from a copy of an untimed build. One JSON line per
+stage is appended to the results file, tagged with the git revision, so runs from
+different versions can be compared. Geocoding is left out because it needs the network;
+everything else runs offline.
+
+Usage: python scripts/benchmark_etl.py --scales 1 10 100 --results benchmark_results.jsonl
+"""
+
+import argparse
+import datetime
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPTS_DIR)
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+import migrations
+from generate_synthetic_corpus import write_corpus
+
+BASE_ROWS = 296
+MIGRATION_STAGES = ['migrate_people', 'create_court_table', 'migrate']
+STAGES = ['build', 'build_stream'] + MIGRATION_STAGES
+
+
+def load_etl():
+    """Import database.db.py, whose dotted file name rules out a plain import"""
+    spec = importlib.util.spec_from_file_location('database_db', os.path.join(ROOT_DIR, 'database.db.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB (ru_maxrss is bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_stage(stage, csv_path, db_path, base_db=None):
+    """Run one stage in the current process; returns (seconds, peak RSS in KiB).
+    Migration stages work on a copy of base_db, an unmigrated build of the same corpus."""
+    etl = load_etl()
+    if base_db:
+        shutil.copy2(base_db, db_path)
+
+    start = time.perf_counter()
+    if stage == 'build':
+        etl.build_database(csv_path, db_path)
+    elif stage == 'build_stream':
+        etl.build_database_streaming(csv_path, db_path)
+    elif stage == 'migrate':
+        etl.migrate_inplace(db_path)
+    else:
+        conn = sqlite3.connect(db_path)
+        if stage == 'migrate_people':
+            migrations.split_people_rows(conn)
+        else:
+            migrations.create_court_table(conn)
+        conn.commit()
+        conn.close()
+    seconds = time.perf_counter() - start
+    return seconds, peak_rss_kb()
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ETL and migrations on synthetic corpora')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100],
+                        help=f'Corpus sizes as multiples of {BASE_ROWS} petitions (default: %(default)s)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help='Stages to run (default: all)')
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic corpus seed (default: %(default)s)')
+    parser.add_argument('--results', default='benchmark_results.jsonl', help='JSON-lines file results are appended to (default: %(default)s)')
+    args = parser.parse_args()
+
+    stages = list(args.stages)
+
+    run = {
+        'run_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'seed': args.seed,
+    }
+    # spawn gives each stage a fresh interpreter, so ru_maxrss is not inherited from this one
+    ctx = multiprocessing.get_context('spawn')
+    workdir = tempfile.mkdtemp(prefix='dv_bench_')
+    try:
+        with open(args.results, 'a', encoding='utf-8') as out:
+            for scale in args.scales:
+                rows = BASE_ROWS * scale
+                csv_path = write_corpus(os.path.join(workdir, f'synthetic_{rows}.csv'), rows, args.seed)
+                base_db = os.path.join(workdir, f'base_{rows}.db')
+                if any(stage in MIGRATION_STAGES for stage in stages):
+                    with ctx.Pool(1) as pool:
+                        pool.apply(run_stage, ('build', csv_path, base_db))
+                for stage in stages:
+                    db_path = os.path.join(workdir, f'{stage}_{rows}.db')
+                    with ctx.Pool(1) as pool:
+                        seconds, rss_kb = pool.apply(run_stage, (stage, csv_path, db_path,
+                                                                  base_db if stage in MIGRATION_STAGES else None))
+                    record = dict(run, stage=stage, scale=scale, rows=rows, seconds=round(seconds, 4),
+                                  rows_per_sec=round(rows / seconds, 1) if seconds else None,
+                                  peak_rss_mb=round(rss_kb / 1024, 1))
+                    out.write(json.dumps(record) + '\n')
+                    out.flush()
+                    print(f"{stage:<20} {rows:>8} rows  {seconds:8.3f}s  {record['rows_per_sec']:>10} rows/s  {record['peak_rss_mb']:>7} MB")
+                    for leftover in os.listdir(workdir):
+                        if leftover.startswith(f'{stage}_{rows}.db'):
+                            os.remove(os.path.join(workdir, leftover))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"Results appended to {args.results}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Micro-benchmark of the Flask chart serialization (flask_app/figure_json.py).
+
+For each dashboard chart it builds the figure from the same query result twice:
+with plotly.express / graph_objects encoded by PlotlyJSONEncoder, as the routes
+used to, and with the minimal figure dicts of figure_json. It prints the median
+time per figure and the payload size of both.
+
+Usage: python scripts/benchmark_figure_json.py [--db dv_petitions.db] [--repeat 50]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+import pandas as pd
+import plotly
+import plotly.express as px
+import plotly.graph_objs as go
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'flask_app'))
+import figure_json
+from figure_json import bar_figure, line_figure, pie_figure
+
+TOTALS = "reasoning_id = 0 AND result = '*'"
+
+QUERIES = {
+    'state': f'''SELECT state, SUM(petition_count) as count FROM Agg_Petition_Cube
+                 WHERE {TOTALS} AND state != '' GROUP BY state ORDER BY count DESC, state''',
+    'year': f'''SELECT year, SUM(petition_count) as count FROM Agg_Petition_Cube
+                WHERE {TOTALS} AND year != 0 GROUP BY year ORDER BY year''',
+    'result': '''SELECT result, SUM(petition_count) as count FROM Agg_Petition_Cube
+                 WHERE reasoning_id = 0 AND result NOT IN ('*', '') GROUP BY result ORDER BY count DESC, result''',
+    'county': f'''SELECT county || ', ' || state as location, SUM(petition_count) as count FROM Agg_Petition_Cube
+                  WHERE {TOTALS} AND county != '' GROUP BY county, state ORDER BY count DESC, county, state LIMIT 20''',
+    'reasoning': '''SELECT r.reasoning, SUM(c.petition_count) as count FROM Agg_Petition_Cube c
+                    JOIN Reasoning r ON r.reasoning_id = c.reasoning_id WHERE c.result = '*'
+                    GROUP BY r.reasoning ORDER BY count DESC''',
+}
+
+
+def plotly_figure(name, df):
+    """The figure as the routes built it with plotly.express / graph_objects"""
+    labels = {'state': 'State', 'year': 'Year', 'location': 'County, State', 'count': 'Number of Petitions'}
+    if name in ('state', 'county'):
+        x = 'state' if name == 'state' else 'location'
+        fig = px.bar(df, x=x, y='count', title='', labels=labels, color='count',
+                     color_continuous_scale='Blues' if name == 'state' else 'Viridis')
+        fig.update_layout(xaxis_tickangle=-45, height=500, template='plotly_white')
+    elif name == 'year':
+        fig = px.line(df, x='year', y='count', title='', labels=labels, markers=True)
+        fig.update_layout(height=500, template='plotly_white')
+    elif name == 'result':
+        fig = px.pie(df, values='count', names='result', title='', hole=0.3)
+        fig.update_layout(height=500, template='plotly_white')
+    else:
+        fig = go.Figure(data=[go.Pie(labels=df['reasoning'].tolist(), values=df['count'].tolist(),
+                                     pull=[0.2] + [0] * (len(df) - 1))])
+        fig.update_traces(textposition='inside', textinfo='percent+label')
+        fig.update_layout(title='', height=600, template='plotly_white', showlegend=True)
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def minimal_figure(name, df):
+    """The same figure through figure_json"""
+    if name in ('state', 'county'):
+        x = 'state' if name == 'state' else 'location'
+        fig = bar_figure(df[x].tolist(), df['count'].tolist(), '', 'State', 'Number of Petitions',
+                         'Blues' if name == 'state' else 'Viridis', 500, tickangle=-45)
+    elif name == 'year':
+        fig = line_figure(df['year'].tolist(), df['count'].tolist(), '', 'Year', 'Number of Petitions', 500)
+    elif name == 'result':
+        fig = pie_figure(df['result'].tolist(), df['count'].tolist(), '', 500, hole=0.3)
+    else:
+        fig = pie_figure(df['reasoning'].tolist(), df['count'].tolist(), '', 600,
+                         pull=[0.2] + [0] * (len(df) - 1), textinfo='percent+label')
+    return figure_json.figure_json(fig)
+
+
+def median_time(func, name, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(name, df)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare PlotlyJSONEncoder with the minimal figure JSON')
+    parser.add_argument('--db', default='dv_petitions.db', help='Database to chart (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=50, help='Timed runs per figure (default: %(default)s)')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    backend = 'orjson' if figure_json.orjson is not None else 'json'
+    print(f'{"chart":<10} {"plotly ms":>10} {"minimal ms":>11} {"plotly bytes":>13} {"minimal bytes":>14}   ({backend})')
+    for name, sql in QUERIES.items():
+        df = pd.read_sql_query(sql, conn)
+        old, new = plotly_figure(name, df), minimal_figure(name, df)
+        old_time = median_time(plotly_figure, name, df, args.repeat)
+        new_time = median_time(minimal_figure, name, df, args.repeat)
+        print(f'{name:<10} {old_time * 1000:10.2f} {new_time * 1000:11.3f} {len(old):13d} {len(new):14d}')
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Query-plan benchmark for the analytic indexes (analytic_indexes.py).
+
+Runs the queries shipped in shiny_app/app.R, flask_app/app.py and queries/ against
+two in-memory copies of a database: one without the analytic indexes and using the
+old text-year filters, one as built today. For each query it prints the EXPLAIN QUERY
+PLAN steps side by side, with each SCAN step that became a SEARCH marked, and the
+median run time of both versions.
+
+Usage: python scripts/benchmark_query_plans.py [--db dv_petitions.db] [--repeat 20]
+
+Run it on a synthetic corpus (scripts/generate_synthetic_corpus.py) to see the
+difference at a larger scale.
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from analytic_indexes import ANALYTIC_INDEXES, index_petitions
+
+OLD_YEAR = 'CAST(COALESCE(p.year, "0") AS INTEGER)'
+
+# (name, SQL, params); {year} is the old CAST filter before and p.year_int after
+QUERIES = [
+    ('shiny map', '''
+        SELECT g.*, COUNT(DISTINCT p.petition_id) as value, p.court as courts,
+               GROUP_CONCAT(DISTINCT res.result) as results, GROUP_CONCAT(DISTINCT p.year) as years,
+               GROUP_CONCAT(DISTINCT r.reasoning) as reasons
+        FROM Geolocations g
+        INNER JOIN Petitions p ON g.county = p.county AND g.state = p.state
+        LEFT JOIN Petition_Reasoning_Lookup prl ON p.petition_id = prl.petition_id
+        LEFT JOIN Reasoning r ON prl.reasoning_id = r.reasoning_id
+        LEFT JOIN Result res ON p.petition_id = res.petition_id
+        WHERE {year} BETWEEN 1830 AND 1850
+        GROUP BY g.state, g.county, g.latitude, g.longitude
+    ''', ()),
+    ('shiny filtered results', '''
+        SELECT DISTINCT p.petition_id, p.year, p.county, p.state,
+               GROUP_CONCAT(DISTINCT r.reasoning) as reasoning_list,
+               GROUP_CONCAT(DISTINCT r.party_accused) as party_accused,
+               p.court as court_name, GROUP_CONCAT(DISTINCT res.result) as result
+        FROM Petitions p
+        LEFT JOIN Petition_Reasoning_Lookup prl ON p.petition_id = prl.petition_id
+        LEFT JOIN Reasoning r ON prl.reasoning_id = r.reasoning_id
+        LEFT JOIN Result res ON p.petition_id = res.petition_id
+        WHERE {year} BETWEEN 1830 AND 1850 AND res.result = 'granted'
+        GROUP BY p.petition_id
+        ORDER BY p.year, p.state, p.county
+    ''', ()),
+    ('flask reasoning_by_state', '''
+        SELECT r.reasoning, COUNT(*) as reasoning_count
+        FROM Reasoning r
+        JOIN Petition_Reasoning_Lookup prl ON r.reasoning_id = prl.reasoning_id
+        JOIN Petitions p ON prl.petition_id = p.petition_id
+        WHERE p.state = ?
+        GROUP BY r.reasoning
+        ORDER BY reasoning_count DESC
+        LIMIT 3
+    ''', ('NC',)),
+    ('flask petitions_by_county', '''
+        SELECT county, state, COUNT(*) as count
+        FROM Petitions
+        WHERE county IS NOT NULL AND county != ''
+        GROUP BY county, state
+        ORDER BY count DESC
+        LIMIT 20
+    ''', ()),
+    ('queries4 reasons per state', '''
+        SELECT p.state, r.reasoning, COUNT(*) as reasoning_count
+        FROM Reasoning r
+        JOIN Petition_Reasoning_Lookup prl ON r.reasoning_id = prl.reasoning_id
+        JOIN Petitions p ON prl.petition_id = p.petition_id
+        GROUP BY p.state, r.reasoning
+        ORDER BY p.state, reasoning_count DESC
+    ''', ()),
+    ('queries5 one reasoning', '''
+        SELECT p.state, r.reasoning, COUNT(*) as petition_count
+        FROM Reasoning r
+        JOIN Petition_Reasoning_Lookup prl ON r.reasoning_id = prl.reasoning_id
+        JOIN Petitions p ON prl.petition_id = p.petition_id
+        WHERE r.reasoning = ?
+        GROUP BY p.state, r.reasoning
+    ''', ('interracial_sex',)),
+    ('granted petitions per state', '''
+        SELECT p.state, COUNT(DISTINCT p.petition_id) as petition_count
+        FROM Result res
+        JOIN Petitions p ON p.petition_id = res.petition_id
+        WHERE res.result = 'granted'
+        GROUP BY p.state
+    ''', ()),
+    ('petitioners per state and year', '''
+        SELECT p.state, p.year, COUNT(DISTINCT ppl.person_id) as people
+        FROM Petitions p
+        JOIN Petition_People_Lookup ppl ON ppl.petition_id = p.petition_id
+        WHERE p.state = ? AND {year} BETWEEN 1840 AND 1860
+        GROUP BY p.state, p.year
+    ''', ('NC',)),
+    ('queries9 petitions per year', '''
+        SELECT {year}, COUNT(*) FROM Petitions p GROUP BY {year}
+    ''', ()),
+]
+
+
+def copy_database(db_path):
+    conn = sqlite3.connect(':memory:')
+    src = sqlite3.connect(db_path)
+    src.backup(conn)
+    src.close()
+    return conn
+
+
+def query_plan(conn, sql, params):
+    return [detail for _id, _parent, _unused, detail in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def median_time(conn, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare query plans with and without the analytic indexes')
+    parser.add_argument('--db', default='dv_petitions.db', help='Database to benchmark (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query (default: %(default)s)')
+    args = parser.parse_args()
+
+    before = copy_database(args.db)
+    for name, _table, _columns in ANALYTIC_INDEXES:
+        before.execute(f'DROP INDEX IF EXISTS {name}')
+    after = copy_database(args.db)
+    # Older databases get year_int and the indexes here, as migration 0005 would add them
+    index_petitions(after)
+
+    for name, sql, params in QUERIES:
+        old_plan = query_plan(before, sql.format(year=OLD_YEAR), params)
+        new_plan = query_plan(after, sql.format(year='p.year_int'), params)
+        old_time = median_time(before, sql.format(year=OLD_YEAR), params, args.repeat)
+        new_time = median_time(after, sql.format(year='p.year_int'), params, args.repeat)
+        print(f'\n{name}: {old_time * 1000:.2f} ms -> {new_time * 1000:.2f} ms')
+        width = max(len(step) for step in old_plan) + 2
+        for i in range(max(len(old_plan), len(new_plan))):
+            old_step = old_plan[i] if i < len(old_plan) else ''
+            new_step = new_plan[i] if i < len(new_plan) else ''
+            marker = '*' if old_step.startswith('SCAN') and new_step.startswith('SEARCH') else ' '
+            print(f'  {marker} {old_step:<{width}} {new_step}')
+
+    before.close()
+    after.close()
+
+
+if __name__ == '__main__':
+    main()
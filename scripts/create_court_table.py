@@ -1,113 +1,74 @@
+import argparse
+import os
 import sqlite3
-from datetime import datetime
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import snapshots
 
 def create_backup(db_path):
-    """Create a backup of the database before making changes"""
-    import shutil
-    backup_path = f"{db_path}.bak.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    shutil.copy2(db_path, backup_path)
-    print(f"Created backup at {backup_path}")
-    return backup_path
+    """Snapshot the database before making changes; returns the snapshot id"""
+    return snapshots.take_snapshot(db_path, label='before create_court_table.py')
 
 def create_court_table(conn):
-    """Create the new Court table"""
+    """Create the Court table, keyed per state; the caller commits"""
     cursor = conn.cursor()
+    columns = [col[1] for col in cursor.execute('PRAGMA table_info(Court)')]
+    if columns and 'state' not in columns:
+        # Court from an older version of this script (court_name only): the dimension is
+        # small, so rebuild it and let add_court_id_to_petitions() re-resolve every petition
+        cursor.execute('DROP TABLE Court')
+        if 'court_id' in [col[1] for col in cursor.execute('PRAGMA table_info(Petitions)')]:
+            cursor.execute('UPDATE Petitions SET court_id = NULL')
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS Court (
-        court_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        court_name TEXT UNIQUE NOT NULL
+        court_id INTEGER PRIMARY KEY,
+        court_name TEXT NOT NULL,
+        state TEXT,
+        UNIQUE(court_name, state)
     )
     ''')
-    conn.commit()
 
 def populate_court_table(conn):
-    """Extract unique courts from Petitions and populate Court table"""
+    """Extract unique (court, state) pairs from Petitions and populate Court table"""
     cursor = conn.cursor()
     
-    # Get all unique court names from Petitions
-    cursor.execute('SELECT DISTINCT court FROM Petitions WHERE court IS NOT NULL')
+    # Get all unique court names per state from Petitions
+    cursor.execute("SELECT DISTINCT court, state FROM Petitions WHERE court IS NOT NULL AND court != ''")
     courts = cursor.fetchall()
     
     # Insert courts into Court table
-    for court in courts:
-        cursor.execute('INSERT OR IGNORE INTO Court (court_name) VALUES (?)', (court[0],))
+    cursor.executemany('INSERT OR IGNORE INTO Court (court_name, state) VALUES (?, ?)', courts)
     
-    conn.commit()
-    print(f"Added {len(courts)} unique courts to Court table")
+    print(f"Found {len(courts)} unique courts for the Court table")
 
 def add_court_id_to_petitions(conn):
-    """Add court_id column to Petitions table"""
+    """Add an indexed court_id column to Petitions and fill it in"""
     cursor = conn.cursor()
     
     # Get the list of columns in Petitions table
     cursor.execute('PRAGMA table_info(Petitions)')
     columns = cursor.fetchall()
     
-    # Check if court_id column exists
+    # Check if court_id column exists. ALTER TABLE can add the foreign key in place,
+    # so the table does not need to be copied.
     if 'court_id' not in [col[1] for col in columns]:
-        # Add new column only if it doesn't exist
-        cursor.execute('ALTER TABLE Petitions ADD COLUMN court_id INTEGER')
+        cursor.execute('ALTER TABLE Petitions ADD COLUMN court_id INTEGER REFERENCES Court(court_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_petitions_court_id ON Petitions(court_id)')
     
-    # Update court_id based on court names
+    # Resolve petitions that have no court_id yet; the UNIQUE(court_name, state) index
+    # makes each lookup a single probe, so this is one pass over Petitions
     cursor.execute('''
     UPDATE Petitions 
     SET court_id = (
         SELECT court_id 
         FROM Court 
-        WHERE Court.court_name = Petitions.court
+        WHERE Court.court_name = Petitions.court AND Court.state IS Petitions.state
     )
-    WHERE court IS NOT NULL
+    WHERE court_id IS NULL AND court IS NOT NULL AND court != ''
     ''')
     
-    # Add foreign key constraint
-    cursor.execute('''
-    CREATE TABLE Petitions_new (
-        petition_id INTEGER PRIMARY KEY,
-        parcel_number TEXT,
-        archive TEXT,
-        month TEXT,
-        year TEXT,
-        county TEXT,
-        state TEXT,
-        years_married TEXT,
-        court TEXT,
-        additional_requests_id INTEGER,
-        petitioner_id INTEGER,
-        defendant_id INTEGER,
-        court_id INTEGER,
-        FOREIGN KEY(additional_requests_id) REFERENCES Additional_Requests(additional_requests_id),
-        FOREIGN KEY(petitioner_id) REFERENCES People(person_id),
-        FOREIGN KEY(defendant_id) REFERENCES People(person_id),
-        FOREIGN KEY(court_id) REFERENCES Court(court_id)
-    )
-    ''')
-    
-    # Copy data to new table
-    cursor.execute('''
-    INSERT INTO Petitions_new 
-    SELECT 
-        petition_id,
-        parcel_number,
-        archive,
-        month,
-        year,
-        county,
-        state,
-        years_married,
-        court,
-        additional_requests_id,
-        petitioner_id,
-        defendant_id,
-        court_id
-    FROM Petitions
-    ''')
-    
-    # Drop old table and rename new one
-    cursor.execute('DROP TABLE Petitions')
-    cursor.execute('ALTER TABLE Petitions_new RENAME TO Petitions')
-    
-    conn.commit()
-    print("Updated Petitions table with court_id foreign key")
+    print(f"Set court_id on {cursor.rowcount} petitions")
 
 def verify_migration(conn):
     """Verify that the migration was successful"""
@@ -129,10 +90,14 @@ def verify_migration(conn):
     print(f"Number of petitions with mapped court_id: {mapped_count}")
 
 def main():
-    db_path = '../dv_petitions.db'
+    parser = argparse.ArgumentParser(description='Add the Court dimension and Petitions.court_id to a database')
+    parser.add_argument('db_path', nargs='?',
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dv_petitions.db'),
+                        help='Database to migrate (default: dv_petitions.db in the repository root)')
+    db_path = parser.parse_args().db_path
     
     # Create backup
-    backup_path = create_backup(db_path)
+    snapshot_id = create_backup(db_path)
     
     # Connect to database
     conn = sqlite3.connect(db_path)
@@ -147,6 +112,7 @@ def main():
         
         print("\nUpdating Petitions table...")
         add_court_id_to_petitions(conn)
+        conn.commit()
         
         print("\nVerifying migration...")
         verify_migration(conn)
@@ -155,7 +121,7 @@ def main():
         
     except Exception as e:
         print(f"\nError during migration: {str(e)}")
-        print(f"You can restore from backup at: {backup_path}")
+        print(f"You can restore the backup with: python snapshots.py --db {db_path} restore {snapshot_id}")
         conn.rollback()
     finally:
         conn.close()
@@ -0,0 +1,131 @@
+"""
+Generate a synthetic petition CSV with the same columns as the transcription data.
+
+Values are drawn from small vocabularies shaped like the real corpus (multi-term
+reasoning and result cells, suffixed reasoning terms, multi-name petitioners,
+repeated parcel numbers), so database.db.py and the migrations do the same kind of
+work they do on the real file. The output is fully determined by --rows and --seed.
+
+Usage: python scripts/generate_synthetic_corpus.py --rows 29600 --out synthetic.csv
+"""
+
+import argparse
+import csv
+import random
+
+FIELDNAMES = [
+    'parcel_number', 'petitioner', 'defendant', 'enslaver_status', 'enslaver_scope_estimate',
+    'reasoning', 'result', 'additional_requests', 'archive', 'month', 'year', 'county',
+    'state', 'years_married', 'end_court',
+]
+
+# state -> (parcel prefix, archives, counties)
+STATES = {
+    'NC': ('11', [
+        'North Carolina Department of Archives and History, Raleigh, NC',
+    ], ['Beaufort', 'Guilford', 'Granville', 'Wake', 'Orange', 'Rowan', 'Halifax', 'Craven', 'Edgecombe', 'Mecklenburg']),
+    'TN': ('14', [
+        'Tennessee State Library and Archives, Nashville, TN',
+        'Metropolitan Nashville-Davidson County Archives',
+    ], ['Davidson', 'Williamson', 'Maury', 'Sumner', 'Rutherford', 'Knox', 'Shelby', 'Wilson']),
+    'AL': ('21', [
+        'University of South Alabama Archives, Mobile, AL',
+        'Talladega County Judicial Building, Talladega, AL',
+        'Sumter County Courthouse, Livingston, AL',
+    ], ['Mobile', 'Talladega', 'Sumter', 'Madison', 'Montgomery', 'Dallas', 'Greene']),
+}
+
+REASONING_TERMS = [
+    'adultery(M)', 'adultery(F)', 'abandonment(M)', 'abandonment(F)', 'cruelty(M)',
+    'intoxication(M)', 'idleness(M)', 'gambling(M)', 'misuse_of_property(M)', 'violence(M)',
+    'threats(M)', 'live_apart', 'interracial_sex(M)', 'interracial_sex(F)', 'prostitution(F)',
+    'adultery_with_prostitute(M)', 'birth_mulatto_child(F)', 'father_mulatto_children(M)',
+    'bigamy(M)', 'impotence(M)', 'pregnant_at_marriage(F)', 'homosexual(M)',
+]
+RESULTS = ['granted', 'partially_granted', 'dismissed', 'denied', 'abated', 'rejected',
+           'senate: read', 'referred', 'house: read']
+ADDITIONAL_REQUESTS = ['alimony', 'Alimony', 'prevent_from_selling_property', 'custody_of_child',
+                       'restore_feme_sole', 'support', 'marry_again', 'return_of_property']
+COURTS = ['chancery', 'superior', 'equity', 'circuit', 'legislative', 'superior, equity', 'petition']
+MONTHS = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August',
+          'September', 'October', 'November', 'December']
+FIRST_NAMES_F = ['Jane', 'Mary', 'Elizabeth', 'Sarah', 'Nancy', 'Martha', 'Ann', 'Susan', 'Lucy', 'Rebecca']
+FIRST_NAMES_M = ['John', 'William', 'James', 'Thomas', 'George', 'Henry', 'Robert', 'Samuel', 'Arnold', 'Joseph']
+SURNAMES = ['Roe', 'Rhodes', 'Smith', 'Johnson', 'Brown', 'Davis', 'Moore', 'Taylor', 'Anderson',
+            'Thomas', 'Jackson', 'White', 'Harris', 'Martin', 'Thompson', 'Walker', 'Allen', 'Young']
+
+
+def pick_list(rng, choices, max_items, empty_rate):
+    """Comma-joined cell with 0..max_items distinct choices"""
+    if rng.random() < empty_rate:
+        return ''
+    return ', '.join(rng.sample(choices, rng.randint(1, max_items)))
+
+
+def person_name(rng, first_names):
+    # The suffix keeps the People table growing with the corpus, as real names do
+    return f"{rng.choice(first_names)} {rng.choice(SURNAMES)}{rng.randint(1, 5000)}"
+
+
+def generate_rows(n, seed=0):
+    """Yield n synthetic CSV rows as dicts keyed by FIELDNAMES"""
+    rng = random.Random(seed)
+    states = list(STATES)
+    parcels = []
+    for i in range(n):
+        state = rng.choice(states)
+        prefix, archives, counties = STATES[state]
+        # About 1% of rows repeat an earlier parcel, like the duplicated parcels in the real data
+        if parcels and rng.random() < 0.01:
+            parcel = rng.choice(parcels)
+        else:
+            parcel = f"{prefix}{i:07d}"
+            parcels.append(parcel)
+
+        petitioner = person_name(rng, FIRST_NAMES_F)
+        # Joint petitions are transcribed as one multi-name cell
+        if rng.random() < 0.03:
+            petitioner += rng.choice([', ', ' & ', ' and ']) + person_name(rng, FIRST_NAMES_F)
+        status = rng.choice(['', '', 'yes', 'enslaver'])
+
+        yield {
+            'parcel_number': parcel,
+            'petitioner': petitioner,
+            'defendant': person_name(rng, FIRST_NAMES_M),
+            'enslaver_status': status,
+            'enslaver_scope_estimate': str(rng.randint(0, 30)) if status and rng.random() < 0.7 else '',
+            'reasoning': pick_list(rng, REASONING_TERMS, 4, 0.02),
+            'result': pick_list(rng, RESULTS, 2, 0.35),
+            'additional_requests': pick_list(rng, ADDITIONAL_REQUESTS, 2, 0.4),
+            'archive': rng.choice(archives),
+            'month': rng.choice(MONTHS),
+            'year': str(rng.randint(1790, 1865)),
+            'county': rng.choice(counties),
+            'state': state,
+            'years_married': str(rng.randint(1, 40)) if rng.random() < 0.6 else '',
+            'end_court': rng.choice(COURTS),
+        }
+
+
+def write_corpus(path, n, seed=0):
+    """Write n synthetic rows to path and return path"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(generate_rows(n, seed))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a seeded synthetic petition CSV')
+    parser.add_argument('--rows', type=int, default=296, help='Number of petitions to generate (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: %(default)s)')
+    parser.add_argument('--out', default='synthetic_petitions.csv', help='Output CSV path (default: %(default)s)')
+    args = parser.parse_args()
+
+    write_corpus(args.out, args.rows, args.seed)
+    print(f"Wrote {args.rows} synthetic petitions to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+Online snapshots of dv_petitions.db, replacing full shutil.copy2 backups.
+
+A snapshot is taken with SQLite's online backup API, so it is consistent even while
+the Flask app or another process is reading the database. The copy is cut into chunks
+of CHUNK_PAGES pages. Each chunk is stored once, zlib-compressed and keyed by its
+SHA-1, in a snapshot store next to the database (dv_petitions.db.snapshots). A new
+snapshot therefore costs only the chunks that changed since earlier ones.
+
+Usage:
+    python snapshots.py take [--label TEXT]
+    python snapshots.py list
+    python snapshots.py restore ID
+    python snapshots.py prune [--keep N]
+    python snapshots.py import dv_petitions.db.bak.*   # fold old full copies into the store
+"""
+
+import argparse
+import datetime
+import hashlib
+import os
+import sqlite3
+import stat
+import tempfile
+import zlib
+
+DB_PATH = 'dv_petitions.db'
+# Pages per stored chunk; small enough that a changed table only dirties a few chunks
+CHUNK_PAGES = 16
+# Snapshots kept per database by take_snapshot()
+KEEP = 20
+
+
+def store_path_for(db_path):
+    return db_path + '.snapshots'
+
+
+def open_store(store_path):
+    conn = sqlite3.connect(store_path)
+    conn.execute('''CREATE TABLE IF NOT EXISTS Snapshots (
+        snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT NOT NULL,
+        label TEXT,
+        page_size INTEGER NOT NULL,
+        size INTEGER NOT NULL
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS Chunks (
+        hash TEXT PRIMARY KEY,
+        data BLOB NOT NULL
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS Snapshot_Chunks (
+        snapshot_id INTEGER,
+        seq INTEGER,
+        hash TEXT,
+        PRIMARY KEY (snapshot_id, seq)
+    )''')
+    conn.commit()
+    return conn
+
+
+def database_image(src):
+    """Return (page_size, bytes) of a consistent copy of src made with the backup API"""
+    mem = sqlite3.connect(':memory:')
+    src.backup(mem)
+    page_size = mem.execute('PRAGMA page_size').fetchone()[0]
+    if hasattr(mem, 'serialize'):
+        image = mem.serialize()
+    else:
+        # Python < 3.11: go through a temporary file instead
+        fd, tmp_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        try:
+            dest = sqlite3.connect(tmp_path)
+            mem.backup(dest)
+            dest.close()
+            with open(tmp_path, 'rb') as f:
+                image = f.read()
+        finally:
+            os.remove(tmp_path)
+    mem.close()
+    return page_size, image
+
+
+def store_image(store, page_size, image, label=None):
+    """Write one snapshot to the store, adding only chunks it does not already hold"""
+    chunk_size = page_size * CHUNK_PAGES
+    refs = []
+    new_chunks = []
+    known = {digest for (digest,) in store.execute('SELECT hash FROM Chunks')}
+    for seq, offset in enumerate(range(0, len(image), chunk_size)):
+        chunk = image[offset:offset + chunk_size]
+        digest = hashlib.sha1(chunk).hexdigest()
+        refs.append((seq, digest))
+        if digest not in known:
+            known.add(digest)
+            new_chunks.append((digest, zlib.compress(chunk)))
+
+    cur = store.cursor()
+    cur.execute('INSERT INTO Snapshots (created_at, label, page_size, size) VALUES (?, ?, ?, ?)',
+                (datetime.datetime.now().isoformat(timespec='seconds'), label, page_size, len(image)))
+    snapshot_id = cur.lastrowid
+    cur.executemany('INSERT OR IGNORE INTO Chunks VALUES (?, ?)', new_chunks)
+    cur.executemany('INSERT INTO Snapshot_Chunks VALUES (?, ?, ?)',
+                    [(snapshot_id, seq, digest) for seq, digest in refs])
+    store.commit()
+    return snapshot_id
+
+
+def take_snapshot(db_path=DB_PATH, label=None, conn=None, keep=KEEP):
+    """Snapshot db_path (or an open connection to it) and apply the retention policy.
+    Returns the new snapshot_id."""
+    src = conn if conn is not None else sqlite3.connect(db_path)
+    try:
+        page_size, image = database_image(src)
+    finally:
+        if conn is None:
+            src.close()
+    store = open_store(store_path_for(db_path))
+    snapshot_id = store_image(store, page_size, image, label)
+    if keep:
+        prune(store, keep)
+    store.close()
+    print(f'Snapshot {snapshot_id} of {db_path} taken' + (f' ({label})' if label else ''))
+    return snapshot_id
+
+
+def list_snapshots(db_path=DB_PATH):
+    """Return (snapshot_id, created_at, label, size) for every stored snapshot, oldest first"""
+    store_path = store_path_for(db_path)
+    if not os.path.exists(store_path):
+        return []
+    store = open_store(store_path)
+    rows = store.execute('SELECT snapshot_id, created_at, label, size FROM Snapshots ORDER BY snapshot_id').fetchall()
+    store.close()
+    return rows
+
+
+def replacement_mode(path):
+    """Permission bits for a file about to be renamed over path: those of the current
+    file, or the umask default when there is none (mkstemp creates files as 0600)"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def restore_snapshot(snapshot_id, db_path=DB_PATH):
+    """Replace db_path with a stored snapshot.
+
+    The current database is snapshotted first, and the restored file is written
+    beside it and renamed over it, so readers see either the old or the restored copy.
+    """
+    store = open_store(store_path_for(db_path))
+    if not store.execute('SELECT 1 FROM Snapshots WHERE snapshot_id = ?', (snapshot_id,)).fetchone():
+        store.close()
+        raise SystemExit(f'No snapshot {snapshot_id} for {db_path}')
+    chunks = store.execute('''
+        SELECT c.data FROM Snapshot_Chunks s JOIN Chunks c ON c.hash = s.hash
+        WHERE s.snapshot_id = ? ORDER BY s.seq
+    ''', (snapshot_id,)).fetchall()
+    store.close()
+
+    if os.path.exists(db_path):
+        take_snapshot(db_path, label=f'before restore of {snapshot_id}')
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(db_path) + '.', suffix='.tmp',
+                                    dir=os.path.dirname(os.path.abspath(db_path)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for (data,) in chunks:
+                f.write(zlib.decompress(data))
+        os.chmod(tmp_path, replacement_mode(db_path))
+        os.replace(tmp_path, db_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    print(f'Restored snapshot {snapshot_id} to {db_path}')
+
+
+def prune(store, keep=KEEP):
+    """Retention: keep the newest `keep` snapshots and drop chunks nothing refers to"""
+    cur = store.cursor()
+    cur.execute('''CREATE TEMP TABLE IF NOT EXISTS Expired (snapshot_id INTEGER PRIMARY KEY)''')
+    cur.execute('DELETE FROM Expired')
+    cur.execute('''INSERT INTO Expired
+                   SELECT snapshot_id FROM Snapshots ORDER BY snapshot_id DESC LIMIT -1 OFFSET ?''', (keep,))
+    expired = cur.execute('SELECT COUNT(*) FROM Expired').fetchone()[0]
+    if expired:
+        cur.execute('DELETE FROM Snapshot_Chunks WHERE snapshot_id IN (SELECT snapshot_id FROM Expired)')
+        cur.execute('DELETE FROM Snapshots WHERE snapshot_id IN (SELECT snapshot_id FROM Expired)')
+        cur.execute('DELETE FROM Chunks WHERE hash NOT IN (SELECT hash FROM Snapshot_Chunks)')
+    store.commit()
+    return expired
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Take, list, restore and prune snapshots of the database')
+    parser.add_argument('--db', default=DB_PATH, help='Database file (default: %(default)s)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    take = sub.add_parser('take', help='Snapshot the database now')
+    take.add_argument('--label', help='Note stored with the snapshot')
+    sub.add_parser('list', help='List stored snapshots')
+    restore = sub.add_parser('restore', help='Replace the database with a snapshot')
+    restore.add_argument('snapshot_id', type=int)
+    prune_cmd = sub.add_parser('prune', help='Drop all but the newest snapshots')
+    prune_cmd.add_argument('--keep', type=int, default=KEEP, help='Snapshots to keep (default: %(default)s)')
+    import_cmd = sub.add_parser('import', help='Store existing full backup files as snapshots')
+    import_cmd.add_argument('files', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'take':
+        take_snapshot(args.db, args.label)
+    elif args.command == 'list':
+        for snapshot_id, created_at, label, size in list_snapshots(args.db):
+            print(f"{snapshot_id:>5}  {created_at}  {size / (1024 * 1024):8.2f} MB  {label or ''}")
+    elif args.command == 'restore':
+        restore_snapshot(args.snapshot_id, args.db)
+    elif args.command == 'prune':
+        store = open_store(store_path_for(args.db))
+        print(f'Dropped {prune(store, args.keep)} snapshots')
+        store.close()
+    elif args.command == 'import':
+        store = open_store(store_path_for(args.db))
+        for path in sorted(args.files):
+            src = sqlite3.connect(path)
+            page_size, image = database_image(src)
+            src.close()
+            snapshot_id = store_image(store, page_size, image, label=os.path.basename(path))
+            print(f'Imported {path} as snapshot {snapshot_id}')
+        store.close()
+        print(f'Store size: {os.path.getsize(store_path_for(args.db)) / (1024 * 1024):.2f} MB')
+
+
+if __name__ == '__main__':
+    main()